@@ -1,18 +1,23 @@
-import pandas as pd
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, stream_with_context, g, has_request_context, before_render_template, template_rendered
 import io
 import os
 import re # 정규식 라이브러리
+import time
+import json
+import base64
+import threading
+import csv
+import tempfile
+import bisect
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from collections import OrderedDict
 
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import or_, func, text, Integer, String
-from sqlalchemy.orm import joinedload # joinedload 임포트
+from sqlalchemy import or_, and_, func, text, inspect, update, bindparam, tuple_, event, case, cast, Integer, BigInteger, String
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
 
-from apscheduler.schedulers.background import BackgroundScheduler
-
-# Google Cloud Vision 라이브러리
-from google.cloud import vision
-from google.oauth2 import service_account
 
 app = Flask(__name__)
 
@@ -23,6 +28,17 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
 )
 app.config['SECRET_KEY'] = 'wasabi-check-secret-key'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# 커넥션 풀: 끊긴 연결(Neon 일시중지 등)은 pre_ping으로 걸러내고, 서버 측 유휴 종료 전에 재생성
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_pre_ping': True,
+    'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 280)),
+}
+if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update({
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    })
 app.config['UPLOAD_FOLDER'] = '/tmp'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
@@ -30,27 +46,6 @@ db = SQLAlchemy(app)
 
 IMAGE_URL_PREFIX = 'https://files.ebizway.co.kr/files/10249/Style/'
 
-# Google Cloud 인증 정보 경로 설정
-GCP_CREDENTIALS_PATH = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
-vision_client = None
-if GCP_CREDENTIALS_PATH and os.path.exists(GCP_CREDENTIALS_PATH):
-    try:
-        credentials = service_account.Credentials.from_service_account_file(GCP_CREDENTIALS_PATH)
-        vision_client = vision.ImageAnnotatorClient(credentials=credentials)
-        print("Google Cloud Vision Client initialized successfully.")
-    except Exception as e:
-        print(f"Error initializing Google Cloud Vision Client: {e}")
-else:
-    print("GOOGLE_APPLICATION_CREDENTIALS not set or invalid.")
-    local_key_path = 'gcp_credentials.json' # 로컬 테스트용 키 파일 이름
-    if os.path.exists(local_key_path):
-        try:
-            credentials = service_account.Credentials.from_service_account_file(local_key_path)
-            vision_client = vision.ImageAnnotatorClient(credentials=credentials)
-            print("Initialized local Google Vision Client.")
-        except Exception as e:
-            print(f"Error initializing local Google Vision Client: {e}")
-
 @app.context_processor
 def inject_image_url_prefix():
     return dict(IMAGE_URL_PREFIX=IMAGE_URL_PREFIX)
@@ -63,7 +58,13 @@ class Product(db.Model):
     is_favorite = db.Column(Integer, default=0)
     release_year = db.Column(Integer)
     item_category = db.Column(String)
+    product_number_key = db.Column(String) # '-' 제거/대문자 정규화 품번 (검색용)
+    related_products = db.Column(db.Text) # 관련 상품 [{product_number, product_name}] JSON (임포트 시 계산)
     variants = db.relationship('Variant', backref='product', lazy=True, cascade="all, delete-orphan")
+    __table_args__ = (
+        db.Index('ix_products_number_key', 'product_number_key', postgresql_ops={'product_number_key': 'text_pattern_ops'}), # OCR 품번 접두 검색용
+        db.Index('ix_products_category_name', 'item_category', 'product_name', 'product_number'), # 목록 키셋 페이지네이션용
+    )
 
 class Variant(db.Model):
     __tablename__ = 'variants'
@@ -75,176 +76,978 @@ class Variant(db.Model):
     hq_stock = db.Column(Integer, default=0)
     original_price = db.Column(Integer, default=0)
     sale_price = db.Column(Integer, default=0)
+    barcode_key = db.Column(String) # '-' 제거/대문자 정규화 바코드 (접두 검색용)
+    size_rank = db.Column(Integer) # 사이즈 정렬 순위 (임포트 시 계산, size_rank() 참고)
+    size_key = db.Column(String) # 대문자/공백 제거 사이즈 (같은 순위끼리 2차 정렬, size_key() 참고)
+    __table_args__ = (
+        db.Index('ix_variants_barcode_key', 'barcode_key', postgresql_ops={'barcode_key': 'text_pattern_ops'}),
+        db.Index('ix_variants_product_number', 'product_number'),
+        db.Index('ix_variants_product_size_order', 'product_number', 'color', 'size_rank', 'size_key'), # 상세 페이지 컬러/사이즈 순서 그대로 인덱스 스캔
+    )
+
+class ProductSummary(db.Model):
+    # 상품별 집계 (목록/카테고리 현황용). 임포트 때 재계산, 재고 조정/즐겨찾기 때 해당 상품만 갱신
+    __tablename__ = 'product_summaries'
+    product_number = db.Column(String, primary_key=True)
+    item_category = db.Column(String)
+    is_favorite = db.Column(Integer, default=0)
+    colors = db.Column(db.Text) # 정렬된 컬러 목록 (', ' 구분)
+    variant_count = db.Column(Integer, default=0)
+    first_sale_price = db.Column(Integer) # 목록 표시 가격 (첫 SKU = 최소 바코드 기준)
+    first_original_price = db.Column(Integer)
+    min_sale_price = db.Column(Integer)
+    max_sale_price = db.Column(Integer)
+    max_discount = db.Column(Integer) # SKU 중 최대 할인율(%)
+    total_store_stock = db.Column(Integer, default=0)
+    total_hq_stock = db.Column(Integer, default=0)
+    store_stock_value = db.Column(BigInteger, default=0) # 매장재고 x 판매가 합계
+    hq_stock_value = db.Column(BigInteger, default=0)
+    __table_args__ = (
+        db.Index('ix_product_summaries_category', 'item_category'),
+    )
+
+class CatalogVersion(db.Model):
+    # 워커/인스턴스 간 공유 카탈로그 버전 (임포트마다 증가). 프로세스 로컬 검색 인덱스/스냅샷이 이 값이 바뀌면 재구성
+    __tablename__ = 'catalog_versions'
+    name = db.Column(String, primary_key=True)
+    version = db.Column(BigInteger, nullable=False, default=0)
+
+# --- 검색 키 정규화 ---
+def normalize_key(value):
+    return str(value or '').replace('-', '').strip().upper()
+
+def prefix_filter(column, prefix):
+    # Postgres: text_pattern_ops 인덱스가 LIKE 'x%'를 처리 / SQLite: BINARY 범위 비교로 인덱스 사용
+    if db.engine.dialect.name == 'postgresql': return column.startswith(prefix, autoescape=True)
+    return and_(column >= prefix, column < prefix + '\uffff')
+
+# --- 사이즈 정렬 순위 ---
+# 숫자 사이즈 < XXS~XXXL < 기타 순. 기타 사이즈끼리는 size_key(대문자/공백 제거)로 2차 정렬
+SIZE_ORDER = {size: index for index, size in enumerate(['XXS', 'XS', 'S', 'M', 'L', 'XL', 'XXL', 'XXXL'])}
+SIZE_ALIASES = {'2XS': 'XXS', '2XL': 'XXL', '3XL': 'XXXL'}
+SIZE_RANK_NAMED = 1000000; SIZE_RANK_OTHER = 2000000
+
+def size_key(size):
+    return str(size or '').upper().strip()
+
+def size_rank(size):
+    size_str = size_key(size); size_str = SIZE_ALIASES.get(size_str, size_str)
+    if size_str.isdecimal(): return min(int(size_str), SIZE_RANK_NAMED - 1)
+    if size_str in SIZE_ORDER: return SIZE_RANK_NAMED + SIZE_ORDER[size_str]
+    return SIZE_RANK_OTHER
 
 # --- DB 초기화 함수 ---
+def migrate_db():
+    # create_all은 기존 테이블에 컬럼을 추가하지 않으므로 누락 컬럼/인덱스를 직접 보강
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name): continue
+        existing = {col['name'] for col in inspector.get_columns(table.name)}
+        with db.engine.begin() as conn:
+            for col in table.columns:
+                if col.name in existing: continue
+                col_type = col.type.compile(dialect=db.engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}')); print(f"컬럼 추가: {table.name}.{col.name}")
+        for index in table.indexes: index.create(bind=db.engine, checkfirst=True)
+    with db.engine.begin() as conn:
+        for size in conn.execute(text("SELECT DISTINCT COALESCE(size, '') FROM variants WHERE size_rank IS NULL OR size_key IS NULL")).scalars():
+            conn.execute(text("UPDATE variants SET size_rank = :rank, size_key = :key WHERE (size_rank IS NULL OR size_key IS NULL) AND COALESCE(size, '') = :size"), {'rank': size_rank(size), 'key': size_key(size), 'size': size})
+        conn.execute(text("UPDATE variants SET barcode_key = UPPER(TRIM(REPLACE(barcode, '-', ''))) WHERE barcode_key IS NULL"))
+        conn.execute(text("UPDATE products SET product_number_key = UPPER(TRIM(REPLACE(product_number, '-', ''))) WHERE product_number_key IS NULL"))
+        conn.execute(text("UPDATE products SET item_category = '' WHERE item_category IS NULL")) # 키셋 비교에서 NULL 제외 방지
+        if conn.execute(text("SELECT 1 FROM catalog_versions WHERE name = 'catalog'")).first() is None: conn.execute(text("INSERT INTO catalog_versions (name, version) VALUES ('catalog', 0)"))
+
 def init_db():
-    with app.app_context(): db.create_all(); print("DB 테이블 초기화/검증 완료.")
+    with app.app_context():
+        db.create_all(); migrate_db(); setup_search_index()
+        if db.session.query(Product.product_number).filter(Product.related_products.is_(None)).first(): refresh_related_products()
+        if db.session.query(ProductSummary.product_number).first() is None: refresh_product_summaries(); db.session.commit()
+        print("DB 테이블 초기화/검증 완료.")
+
+# --- 공유 카탈로그 버전 ---
+def shared_catalog_version():
+    return db.session.execute(db.select(CatalogVersion.version).where(CatalogVersion.name == 'catalog')).scalar() or 0
+
+def bump_catalog_version():
+    # 다른 워커의 n-gram 인덱스/컬럼형 스냅샷도 다음 사용 때 재구성되도록
+    db.session.execute(update(CatalogVersion).where(CatalogVersion.name == 'catalog').values(version=CatalogVersion.version + 1)); db.session.commit()
+
+# --- 상품 검색 백엔드 ---
+# Postgres: pg_trgm GIN 인덱스 / SQLite: FTS5 trigram 테이블 / 그 외: 메모리 n-gram 인덱스
+# trigram 계열은 3글자 미만 검색어(한글 2글자 등)를 색인으로 찾지 못하므로 그런 검색어는 메모리 bigram 인덱스로 처리
+app.config['SEARCH_BACKEND'] = os.environ.get('SEARCH_BACKEND', 'auto') # auto | pg_trgm | fts5 | ngram
+app.config['SEARCH_INDEX_TTL'] = int(os.environ.get('SEARCH_INDEX_TTL', 300)) # ngram 인덱스 재구성 주기(초)
+search_state = {'backend': None, 'ngram': None, 'built_at': 0.0, 'version': None}
+NGRAM_SIZE = 2 # 한글 2글자 검색어 지원을 위해 bigram 사용
+
+FTS_SETUP_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(product_number UNINDEXED, product_number_key, product_name, tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN INSERT INTO products_fts(rowid, product_number, product_number_key, product_name) VALUES (new.rowid, new.product_number, new.product_number_key, new.product_name); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN DELETE FROM products_fts WHERE rowid = old.rowid; END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF product_number, product_number_key, product_name ON products BEGIN DELETE FROM products_fts WHERE rowid = old.rowid; INSERT INTO products_fts(rowid, product_number, product_number_key, product_name) VALUES (new.rowid, new.product_number, new.product_number_key, new.product_name); END",
+    # rowid가 VACUUM 등으로 바뀌어도 init-db 때 다시 맞춰지도록 재구성
+    "DELETE FROM products_fts",
+    "INSERT INTO products_fts(rowid, product_number, product_number_key, product_name) SELECT rowid, product_number, product_number_key, product_name FROM products",
+]
+TRGM_SETUP_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (product_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_products_number_key_trgm ON products USING gin (product_number_key gin_trgm_ops)",
+]
+
+def setup_search_index():
+    setup_sql = {'postgresql': TRGM_SETUP_SQL, 'sqlite': FTS_SETUP_SQL}.get(db.engine.dialect.name)
+    if not setup_sql: return
+    try:
+        with db.engine.begin() as conn:
+            for sql in setup_sql: conn.execute(text(sql))
+        print("검색 인덱스 초기화 완료.")
+    except Exception as e: print(f"검색 인덱스 생성 실패 (n-gram 대체 사용): {e}")
+    search_state['backend'] = None
+
+def search_backend():
+    if search_state['backend'] is None:
+        backend = app.config['SEARCH_BACKEND']
+        if backend == 'auto':
+            backend = 'ngram'
+            with db.engine.connect() as conn:
+                if db.engine.dialect.name == 'postgresql':
+                    if conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first(): backend = 'pg_trgm'
+                elif db.engine.dialect.name == 'sqlite':
+                    if conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")).first(): backend = 'fts5'
+        search_state['backend'] = backend
+    return search_state['backend']
+
+def invalidate_search_index():
+    search_state['ngram'] = None
+
+def search_terms(term, fields):
+    # 품번은 공백/'-' 무시 + 대문자, 품명은 대소문자 무시 부분 일치
+    number_key = normalize_key(term.replace(' ', '')) if 'number' in fields else ''
+    name_term = term.strip() if 'name' in fields else ''
+    return number_key, name_term
+
+def relevance_order(number_key, name_term):
+    order = []
+    if number_key: order += [(Product.product_number_key == number_key).desc(), Product.product_number_key.startswith(number_key, autoescape=True).desc()]
+    if name_term: order += [Product.product_name.istartswith(name_term, autoescape=True).desc()]
+    return order
+
+def search_sql(number_key, name_term, exclude, limit):
+    conditions = []
+    if number_key: conditions.append(Product.product_number_key.contains(number_key, autoescape=True))
+    if name_term: conditions.append(Product.product_name.icontains(name_term, autoescape=True))
+    query = db.session.query(Product.product_number).filter(or_(*conditions))
+    if exclude: query = query.filter(Product.product_number != exclude)
+    order = relevance_order(number_key, name_term)
+    if name_term and search_backend() == 'pg_trgm': order.append(func.similarity(Product.product_name, name_term).desc())
+    return [row[0] for row in query.order_by(*order, Product.product_name).limit(limit).all()]
+
+def short_search_terms(number_key, name_term):
+    return bool(number_key and len(number_key) < 3) or bool(name_term and len(name_term) < 3)
+
+def search_trgm(number_key, name_term, exclude, limit):
+    if short_search_terms(number_key, name_term): return search_ngram(number_key, name_term, exclude, limit)
+    return search_sql(number_key, name_term, exclude, limit)
+
+def search_fts5(number_key, name_term, exclude, limit):
+    if short_search_terms(number_key, name_term): return search_ngram(number_key, name_term, exclude, limit)
+    quote = lambda value: '"' + value.replace('"', '""') + '"'
+    match = ' OR '.join(([f'product_number_key : {quote(number_key)}'] if number_key else []) + ([f'product_name : {quote(name_term)}'] if name_term else []))
+    sql = "SELECT product_number FROM products_fts WHERE products_fts MATCH :match" + (" AND product_number != :exclude" if exclude else "")
+    sql += (" ORDER BY (product_number_key = :key) DESC, (substr(product_number_key, 1, length(:key)) = :key) DESC,"
+            " (lower(substr(product_name, 1, length(:name))) = lower(:name)) DESC, bm25(products_fts), product_name LIMIT :limit")
+    params = {'match': match, 'exclude': exclude, 'key': number_key or None, 'name': name_term or None, 'limit': -1 if limit is None else limit}
+    return [row[0] for row in db.session.execute(text(sql), params)]
+
+def ngrams(value):
+    value = value.lower()
+    return {value[i:i + NGRAM_SIZE] for i in range(max(1, len(value) - NGRAM_SIZE + 1))}
+
+def ngram_index():
+    now = time.time(); version = shared_catalog_version()
+    if search_state['ngram'] is None or search_state['version'] != version or now - search_state['built_at'] > app.config['SEARCH_INDEX_TTL']:
+        entries = {}; postings = {}
+        for product_number, number_key, product_name in db.session.query(Product.product_number, Product.product_number_key, Product.product_name):
+            entries[product_number] = (number_key or normalize_key(product_number), product_name or '')
+            for gram in ngrams(entries[product_number][0]) | ngrams(entries[product_number][1]): postings.setdefault(gram, set()).add(product_number)
+        search_state['ngram'] = (entries, postings); search_state['built_at'] = now; search_state['version'] = version
+    return search_state['ngram']
+
+def search_ngram(number_key, name_term, exclude, limit):
+    entries, postings = ngram_index()
+    candidates = set()
+    for value in filter(None, [number_key, name_term]):
+        if len(value) < NGRAM_SIZE: candidates |= set(entries); continue
+        grams = [postings.get(gram, set()) for gram in ngrams(value)]
+        candidates |= set.intersection(*grams) if grams else set()
+    name_lower = name_term.lower(); results = []
+    for product_number in candidates:
+        key, name = entries[product_number]
+        if product_number == exclude: continue
+        in_number = bool(number_key) and number_key in key; in_name = bool(name_term) and name_lower in name.lower()
+        if not (in_number or in_name): continue
+        rank = (not (in_number and key == number_key), not (in_number and key.startswith(number_key)), not (in_name and name.lower().startswith(name_lower)),
+                -len(name_lower) / max(len(name), 1) if in_name else 0)
+        results.append((rank, name, product_number))
+    results.sort()
+    return [product_number for _, _, product_number in results[:limit]]
+
+SEARCH_BACKENDS = {'pg_trgm': search_trgm, 'fts5': search_fts5, 'ngram': search_ngram}
+
+def search_product_numbers(term, fields=('number', 'name'), limit=None, exclude=None):
+    # 관련도 순 품번 리스트 (정확한 품번 > 품번 접두 > 품명 접두 > 백엔드 점수)
+    number_key, name_term = search_terms(term or '', fields)
+    if not (number_key or name_term): return []
+    return SEARCH_BACKENDS.get(search_backend(), search_sql)(number_key, name_term, exclude, limit)
+
+def products_in_order(product_numbers, options=()):
+    if not product_numbers: return []
+    products = {product.product_number: product for product in Product.query.options(*options).filter(Product.product_number.in_(product_numbers))}
+    return [products[product_number] for product_number in product_numbers if product_number in products]
+
+# --- 관련 상품 (임포트 시 미리 계산) ---
+# 품명 마지막 단어로 품명 검색한 상위 RELATED_LIMIT개 (자기 자신 제외). 같은 단어는 한 번만 검색
+RELATED_LIMIT = 5
+
+def related_term(product_name):
+    search_words = (product_name or '').split(' ')
+    return search_words[-1] if len(search_words[-1]) > 1 else ''
+
+def product_chunks(*columns):
+    # 전체 상품을 품번 키셋으로 IMPORT_CHUNK_SIZE행씩 (product_number, *columns) (카탈로그 전체를 메모리에 올리지 않음)
+    last = None
+    while True:
+        query = db.select(Product.product_number, *columns).order_by(Product.product_number).limit(IMPORT_CHUNK_SIZE)
+        if last is not None: query = query.where(Product.product_number > last)
+        rows = db.session.execute(query).all()
+        if not rows: return
+        yield rows; last = rows[-1][0]
+
+def refresh_related_products():
+    # 상품 청크마다 계산해 값이 바뀐 행만 UPDATE (검색 결과 캐시도 청크 단위)
+    for rows in product_chunks(Product.product_name, Product.related_products):
+        matches = {}
+        for _, product_name, _ in rows:
+            term = related_term(product_name)
+            if term and term not in matches: matches[term] = search_product_numbers(term, fields=('name',), limit=RELATED_LIMIT + 1)
+        found = {number for numbers in matches.values() for number in numbers}
+        names = dict(db.session.execute(db.select(Product.product_number, Product.product_name).where(Product.product_number.in_(found))).all()) if found else {}
+        mappings = []
+        for product_number, product_name, current in rows:
+            related = [number for number in matches.get(related_term(product_name), []) if number != product_number][:RELATED_LIMIT]
+            related_json = json.dumps([{'product_number': number, 'product_name': names[number]} for number in related if number in names], ensure_ascii=False)
+            if related_json != current: mappings.append({'product_number': product_number, 'related_products': related_json})
+        if mappings: db.session.bulk_update_mappings(Product, mappings)
+    db.session.commit()
+
+def refresh_related_after_import():
+    # 임포트 커밋 후 품명이 추가/변경/삭제된 경우에만 호출. 실패해도 임포트 결과는 유지
+    invalidate_search_index()
+    try: refresh_related_products()
+    except Exception as e: db.session.rollback(); print(f"관련 상품 갱신 실패: {e}")
+
+
+# --- 카탈로그 요약 (product_summaries) ---
+# 목록은 컬러/첫 가격을, 카테고리 현황은 재고/금액 합계를 이 테이블에서 바로 읽음 (variants 집계 없음)
+SUMMARY_DISCOUNT = case((Variant.original_price > 0, (Variant.original_price - Variant.sale_price) * 100 // Variant.original_price), else_=0)
+SUMMARY_COLS = ['product_number', 'item_category', 'is_favorite', 'variant_count', 'first_sale_price', 'first_original_price', 'min_sale_price', 'max_sale_price',
+                'max_discount', 'total_store_stock', 'total_hq_stock', 'store_stock_value', 'hq_stock_value']
+
+def stock_value(stock_col):
+    return cast(func.coalesce(stock_col, 0), BigInteger) * func.coalesce(Variant.sale_price, 0)
+
+def summary_select(scope):
+    totals = db.select(
+        Variant.product_number, func.count().label('variant_count'), func.min(Variant.barcode).label('first_barcode'),
+        func.min(Variant.sale_price).label('min_sale_price'), func.max(Variant.sale_price).label('max_sale_price'), func.max(SUMMARY_DISCOUNT).label('max_discount'),
+        func.sum(Variant.store_stock).label('total_store_stock'), func.sum(Variant.hq_stock).label('total_hq_stock'),
+        func.sum(stock_value(Variant.store_stock)).label('store_stock_value'), func.sum(stock_value(Variant.hq_stock)).label('hq_stock_value'),
+    ).where(scope(Variant.product_number)).group_by(Variant.product_number).subquery()
+    first = db.aliased(Variant)
+    zero = lambda column: func.coalesce(column, 0)
+    return db.select(
+        Product.product_number, Product.item_category, Product.is_favorite, zero(totals.c.variant_count), first.sale_price, first.original_price,
+        totals.c.min_sale_price, totals.c.max_sale_price, totals.c.max_discount, zero(totals.c.total_store_stock), zero(totals.c.total_hq_stock),
+        zero(totals.c.store_stock_value), zero(totals.c.hq_stock_value),
+    ).select_from(Product).outerjoin(totals, totals.c.product_number == Product.product_number).outerjoin(first, first.barcode == totals.c.first_barcode).where(scope(Product.product_number))
+
+def refresh_product_summaries(product_numbers=None):
+    # product_numbers가 None이면 전체, 아니면 해당 상품만 IMPORT_CHUNK_SIZE개씩 재계산 (커밋은 호출하는 쪽 트랜잭션에서)
+    if product_numbers is None:
+        db.session.execute(db.delete(ProductSummary)) # 삭제된 상품의 요약까지 정리
+        chunks = ([row.product_number for row in rows] for rows in product_chunks())
+    else:
+        keys = sorted(set(product_numbers))
+        chunks = (keys[start:start + IMPORT_CHUNK_SIZE] for start in range(0, len(keys), IMPORT_CHUNK_SIZE))
+    for chunk in chunks:
+        scope = lambda column: column.in_(chunk)
+        db.session.execute(db.delete(ProductSummary).where(scope(ProductSummary.product_number)))
+        db.session.execute(db.insert(ProductSummary).from_select(SUMMARY_COLS, summary_select(scope)))
+        colors = {}
+        for product_number, color in db.session.execute(db.select(Variant.product_number, Variant.color).where(scope(Variant.product_number), Variant.color.isnot(None)).distinct()):
+            colors.setdefault(product_number, []).append(color)
+        if colors: db.session.execute(update(ProductSummary), [{'product_number': key, 'colors': ', '.join(sorted(values))} for key, values in colors.items()])
+
+def refresh_summary_stock(product_numbers):
+    # 재고 조정 후 해당 상품의 매장재고 합계/금액만 다시 합산 (ix_variants_product_size_order 범위 스캔)
+    total = lambda expr: db.select(func.coalesce(func.sum(expr), 0)).where(Variant.product_number == ProductSummary.product_number).scalar_subquery()
+    db.session.execute(update(ProductSummary).where(ProductSummary.product_number.in_(list(product_numbers)))
+                       .values(total_store_stock=total(Variant.store_stock), store_stock_value=total(stock_value(Variant.store_stock))))
 
 # --- 엑셀 임포트 ---
+# pandas는 임포트 실행 시에만 로드 (콜드 스타트 단축)
+REQUIRED_COLS = [ 'product_number', 'product_name', 'color', 'barcode', 'size', 'release_year', 'item_category', 'original_price', 'sale_price', 'store_stock', 'hq_stock']
+PRODUCT_COLS = ['product_number', 'product_name', 'release_year', 'item_category', 'is_favorite']
+VARIANT_COLS = [ 'barcode', 'product_number', 'color', 'size', 'store_stock', 'hq_stock', 'original_price', 'sale_price' ]
+IMPORT_CHUNK_SIZE = 1000
+# /import_excel 업로드 한도(바이트). 전역 MAX_CONTENT_LENGTH(16MB)와 별도 (스트리밍 임포트는 파일 크기와 무관하게 청크 단위로 처리)
+app.config['IMPORT_MAX_CONTENT_LENGTH'] = int(os.environ.get('IMPORT_MAX_CONTENT_LENGTH', 512 * 1024 * 1024))
+IMPORT_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+class ExcelImportError(Exception):
+    pass
+
+def check_required_cols(excel_cols):
+    missing = [col for col in REQUIRED_COLS if col not in excel_cols]
+    if missing: raise ExcelImportError(f"엑셀 컬럼명 오류. 누락: {missing}")
+
+PRODUCT_TEXT_COLS = ['product_name', 'item_category']
+VARIANT_TEXT_COLS = ['color', 'size']
+VARIANT_INT_COLS = ['store_stock', 'hq_stock', 'original_price', 'sale_price']
+
+def read_excel_frames(file):
+    # 엑셀을 읽어 상품/SKU 데이터프레임으로 분리 (replace/delta 공용)
+    import pandas as pd
+    file_content = file.read()
+    if file.filename.endswith('.csv'): df = pd.read_csv( io.BytesIO(file_content), dtype={'barcode': str, 'product_number': str}, keep_default_na=False, encoding='utf-8-sig' )
+    else: df = pd.read_excel( io.BytesIO(file_content), sheet_name=0, dtype={'barcode': str, 'product_number': str}, keep_default_na=False )
+    check_required_cols(list(df.columns))
+    has_favorite = 'is_favorite' in df.columns
+    if not has_favorite: df['is_favorite'] = 0
+    else: df['is_favorite'] = pd.to_numeric(df['is_favorite'], errors='coerce').fillna(0).astype(int)
+
+    products_df = df[PRODUCT_COLS].drop_duplicates(subset=['product_number']).copy(); products_df.dropna(subset=['product_number'], inplace=True)
+    variants_df = df[VARIANT_COLS].copy(); variants_df.dropna(subset=['barcode'], inplace=True)
+    variants_df = variants_df[variants_df['barcode'].astype(str).str.strip() != ''] # 바코드 빈 행은 상품만 (스트리밍 임포트와 동일)
+    products_df['product_number_key'] = products_df['product_number'].map(normalize_key)
+    variants_df['barcode_key'] = variants_df['barcode'].map(normalize_key)
+    variants_df['size_rank'] = variants_df['size'].map(size_rank); variants_df['size_key'] = variants_df['size'].map(size_key)
+    return normalize_products_df(products_df), normalize_variants_df(variants_df), has_favorite
+
+def normalize_products_df(products_df):
+    import pandas as pd
+    for col in PRODUCT_TEXT_COLS: products_df[col] = products_df[col].fillna('').astype(str)
+    products_df['release_year'] = pd.to_numeric(products_df['release_year'], errors='coerce').astype('Int64')
+    products_df['is_favorite'] = pd.to_numeric(products_df['is_favorite'], errors='coerce').fillna(0).astype(int)
+    return products_df
+
+def normalize_variants_df(variants_df):
+    import pandas as pd
+    for col in VARIANT_TEXT_COLS: variants_df[col] = variants_df[col].fillna('').astype(str)
+    for col in VARIANT_INT_COLS: variants_df[col] = pd.to_numeric(variants_df[col], errors='coerce').fillna(0).astype(int)
+    return variants_df
+
+def frame_records(frame):
+    # pd.NA/NaN -> None (DB 드라이버 호환)
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+def import_excel_replace(file):
+    # 전체 삭제 후 재삽입 (기존 방식)
+    products_df, variants_df, _ = read_excel_frames(file)
+    db.session.query(Variant).delete(); db.session.query(Product).delete(); db.session.query(ProductSummary).delete(); db.session.commit()
+    db.session.bulk_insert_mappings(Product, frame_records(products_df))
+    db.session.bulk_insert_mappings(Variant, frame_records(variants_df))
+    refresh_product_summaries(); db.session.commit()
+    refresh_related_after_import()
+    return f"{len(products_df)}개 상품, {len(variants_df)}개 SKU 임포트."
+
+def diff_frames(incoming, current, key, compare_cols):
+    # 행 해시를 벡터 연산으로 비교해 추가/수정/삭제 키를 계산
+    import pandas as pd
+    row_hash = lambda frame: pd.util.hash_pandas_object(frame[compare_cols].astype(str), index=False).to_numpy()
+    left = pd.DataFrame({key: incoming[key].to_numpy(), 'hash': row_hash(incoming)})
+    right = pd.DataFrame({key: current[key].to_numpy(), 'hash': row_hash(current)})
+    merged = left.merge(right, on=key, how='outer', suffixes=('_new', '_old'), indicator=True)
+    inserted = merged.loc[merged['_merge'] == 'left_only', key]
+    deleted = merged.loc[merged['_merge'] == 'right_only', key]
+    updated = merged.loc[(merged['_merge'] == 'both') & (merged['hash_new'] != merged['hash_old']), key]
+    return incoming[incoming[key].isin(inserted)], incoming[incoming[key].isin(updated)], deleted.tolist()
+
+def category_change_counts(changes):
+    # changes: {라벨: item_category 시리즈} -> '품목: 라벨 n, ... / ...' 요약 (변경 없는 품목은 생략)
+    import pandas as pd
+    counts = pd.DataFrame({label: categories.fillna('').replace('', '(미분류)').value_counts() for label, categories in changes.items()}).fillna(0).astype(int)
+    return ' / '.join(f"{category}: " + ', '.join(f"{label} {count}" for label, count in row.items() if count) for category, row in counts.sort_index().iterrows())
+
+def delete_in_chunks(model, key_col, keys, chunk_size=IMPORT_CHUNK_SIZE):
+    for start in range(0, len(keys), chunk_size):
+        db.session.query(model).filter(key_col.in_(keys[start:start + chunk_size])).delete(synchronize_session=False)
+
+def import_excel_delta(file):
+    # 현재 DB와 비교해 변경된 행만 INSERT/UPDATE/DELETE (변경량에 비례하는 비용)
+    import pandas as pd
+    products_df, variants_df, has_favorite = read_excel_frames(file)
+    products_df = products_df.drop_duplicates(subset=['product_number']); variants_df = variants_df.drop_duplicates(subset=['barcode'])
+    connection = db.session.connection()
+    current_products = normalize_products_df(pd.read_sql(db.select(*[getattr(Product, col) for col in PRODUCT_COLS]), connection))
+    current_variants = normalize_variants_df(pd.read_sql(db.select(*[getattr(Variant, col) for col in VARIANT_COLS]), connection))
+
+    product_compare_cols = PRODUCT_COLS[1:] if has_favorite else [col for col in PRODUCT_COLS[1:] if col != 'is_favorite']
+    product_inserts, product_updates, product_deletes = diff_frames(products_df, current_products, 'product_number', product_compare_cols)
+    variant_inserts, variant_updates, variant_deletes = diff_frames(variants_df, current_variants, 'barcode', VARIANT_COLS[1:])
+
+    # 파일에 없는 SKU는 바코드 기준으로 지우고, 상품 삭제는 SKU 이동(수정)이 끝난 뒤에 (FK 순서)
+    delete_in_chunks(Variant, Variant.barcode, variant_deletes)
+    db.session.bulk_insert_mappings(Product, frame_records(product_inserts))
+    db.session.bulk_update_mappings(Product, frame_records(product_updates[['product_number'] + product_compare_cols]))
+    db.session.bulk_insert_mappings(Variant, frame_records(variant_inserts))
+    db.session.bulk_update_mappings(Variant, frame_records(variant_updates))
+    delete_in_chunks(Product, Product.product_number, product_deletes)
+    # 요약 갱신 대상: 바뀐 상품 + 바뀐 SKU의 새/기존 상품
+    moved_or_deleted = current_variants.loc[current_variants['barcode'].isin(list(variant_updates['barcode']) + variant_deletes), 'product_number']
+    refresh_product_summaries(set(product_inserts['product_number']) | set(product_updates['product_number']) | set(product_deletes)
+                              | set(variant_inserts['product_number']) | set(variant_updates['product_number']) | set(moved_or_deleted))
+    db.session.commit()
+    old_names = current_products.set_index('product_number')['product_name']
+    renamed = (product_updates['product_name'].to_numpy() != old_names.reindex(product_updates['product_number']).to_numpy()).any()
+    if len(product_inserts) or product_deletes or renamed: refresh_related_after_import()
+    # 품목별 집계: 추가/수정은 새 값, 삭제는 기존 값 기준
+    new_categories = products_df.set_index('product_number')['item_category']; old_categories = current_products.set_index('product_number')['item_category']
+    deleted_variant_products = current_variants.loc[current_variants['barcode'].isin(variant_deletes), 'product_number']
+    by_category = category_change_counts({
+        '상품 추가': product_inserts['item_category'], '상품 수정': product_updates['item_category'], '상품 삭제': old_categories.reindex(product_deletes),
+        'SKU 추가': new_categories.reindex(variant_inserts['product_number']), 'SKU 수정': new_categories.reindex(variant_updates['product_number']),
+        'SKU 삭제': old_categories.reindex(deleted_variant_products)})
+    return (f"상품 추가 {len(product_inserts)} / 수정 {len(product_updates)} / 삭제 {len(product_deletes)}, "
+            f"SKU 추가 {len(variant_inserts)} / 수정 {len(variant_updates)} / 삭제 {len(variant_deletes)}." + (f" 품목별 - {by_category}" if by_category else ''))
+
+def cell_str(value):
+    if value is None: return ''
+    if isinstance(value, float) and value.is_integer(): value = int(value)
+    return str(value).strip()
+
+def cell_int(value, default=0):
+    try: return int(float(value))
+    except (TypeError, ValueError): return default
+
+def upsert_stmt(model, update_cols):
+    if db.engine.dialect.name == 'postgresql': from sqlalchemy.dialects.postgresql import insert
+    else: from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(model)
+    pk_cols = [col.name for col in model.__table__.primary_key]
+    return stmt.on_conflict_do_update(index_elements=pk_cols, set_={col: stmt.excluded[col] for col in update_cols})
+
+def iter_sheet_rows(file, filename):
+    # 첫 시트(또는 CSV)를 행 튜플 단위로 읽음 (xlsx는 openpyxl read-only 모드)
+    if filename.endswith('.csv'):
+        yield from csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+        return
+    from openpyxl import load_workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try: yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally: workbook.close()
+
+def iter_excel_chunks(file, filename, chunk_size=IMPORT_CHUNK_SIZE):
+    # 헤더를 먼저 반환한 뒤 chunk_size개씩 dict 리스트로 반환
+    rows = iter_sheet_rows(file, filename)
+    header = [cell_str(col) for col in next(rows, ())]
+    check_required_cols(header)
+    yield header
+    chunk = []
+    for row in rows:
+        chunk.append(dict(zip(header, row)))
+        if len(chunk) >= chunk_size: yield chunk; chunk = []
+    if chunk: yield chunk
+
+def import_excel_stream(file):
+    # 고정 크기 청크 단위 upsert + 누락 행 삭제를 하나의 트랜잭션에서 처리 (읽는 쪽은 커밋 전까지 기존 카탈로그를 봄)
+    chunks = iter_excel_chunks(file.stream, file.filename)
+    header = next(chunks); has_favorite = 'is_favorite' in header
+    product_update_cols = ['product_name', 'release_year', 'item_category'] + (['is_favorite'] if has_favorite else [])
+    product_stmt = upsert_stmt(Product, product_update_cols)
+    variant_stmt = upsert_stmt(Variant, ['product_number', 'color', 'size', 'store_stock', 'hq_stock', 'original_price', 'sale_price', 'barcode_key', 'size_rank', 'size_key'])
+    session = db.session
+    for table, key in [('import_seen_products', 'product_number'), ('import_seen_variants', 'barcode')]:
+        session.execute(text(f'DROP TABLE IF EXISTS {table}')); session.execute(text(f'CREATE TEMPORARY TABLE {table} ({key} VARCHAR PRIMARY KEY)'))
+    in_keys = lambda sql: text(sql).bindparams(bindparam('keys', expanding=True))
+    product_count = 0; names_changed = False
+    for chunk in chunks:
+        products = {}; variants = {}
+        for row in chunk:
+            product_number = cell_str(row.get('product_number')); barcode = cell_str(row.get('barcode'))
+            if not product_number: continue
+            if product_number not in products:
+                products[product_number] = {'product_number': product_number, 'product_number_key': normalize_key(product_number), 'product_name': cell_str(row.get('product_name')),
+                    'release_year': cell_int(row.get('release_year'), None), 'item_category': cell_str(row.get('item_category')), 'is_favorite': cell_int(row.get('is_favorite'))}
+            if barcode:
+                variants[barcode] = {'barcode': barcode, 'barcode_key': normalize_key(barcode), 'product_number': product_number,
+                    'color': cell_str(row.get('color')), 'size': cell_str(row.get('size')), 'size_rank': size_rank(cell_str(row.get('size'))), 'size_key': size_key(cell_str(row.get('size'))),
+                    **{col: cell_int(row.get(col)) for col in ['store_stock', 'hq_stock', 'original_price', 'sale_price']}}
+        if products:
+            # 이전 청크에서 이미 처리한 상품은 건너뜀 (첫 행 기준, 기존 drop_duplicates와 동일)
+            seen = set(session.execute(in_keys('SELECT product_number FROM import_seen_products WHERE product_number IN :keys'), {'keys': list(products)}).scalars())
+            fresh = [data for key, data in products.items() if key not in seen]
+            if fresh:
+                if not names_changed:
+                    old_names = dict(session.execute(in_keys('SELECT product_number, product_name FROM products WHERE product_number IN :keys'), {'keys': [data['product_number'] for data in fresh]}).all())
+                    names_changed = any(old_names.get(data['product_number']) != data['product_name'] for data in fresh)
+                session.execute(product_stmt, fresh)
+                session.execute(text('INSERT INTO import_seen_products (product_number) VALUES (:product_number)'), [{'product_number': data['product_number']} for data in fresh])
+                product_count += len(fresh)
+        if variants:
+            session.execute(variant_stmt, list(variants.values()))
+            session.execute(in_keys('DELETE FROM import_seen_variants WHERE barcode IN :keys'), {'keys': list(variants)})
+            session.execute(text('INSERT INTO import_seen_variants (barcode) VALUES (:barcode)'), [{'barcode': key} for key in variants])
+    variant_count = session.execute(text('SELECT COUNT(*) FROM import_seen_variants')).scalar()
+    # 이번 파일에 없는 SKU/상품 삭제 (NOT EXISTS: Postgres에서 anti-join으로 처리, NOT IN 서브쿼리는 메모리 초과 시 행마다 재스캔)
+    session.execute(text('DELETE FROM variants WHERE NOT EXISTS (SELECT 1 FROM import_seen_variants s WHERE s.barcode = variants.barcode)'))
+    names_changed |= session.execute(text('DELETE FROM products WHERE NOT EXISTS (SELECT 1 FROM import_seen_products s WHERE s.product_number = products.product_number)')).rowcount > 0
+    session.execute(text('DROP TABLE import_seen_products')); session.execute(text('DROP TABLE import_seen_variants'))
+    refresh_product_summaries(); session.commit()
+    if names_changed: refresh_related_after_import()
+    return f"{product_count}개 상품, {variant_count}개 SKU 임포트."
+
+IMPORT_MODES = {'replace': import_excel_replace, 'stream': import_excel_stream, 'delta': import_excel_delta}
+
 @app.route('/import_excel', methods=['GET', 'POST'])
 def import_excel():
+    request.max_content_length = app.config['IMPORT_MAX_CONTENT_LENGTH'] # 폼 파싱 전에 설정해야 적용됨
     if request.method == 'POST':
         if 'excel_file' not in request.files: flash('파일 선택 안됨.', 'error'); return redirect(url_for('index'))
         file = request.files['excel_file']
         if file.filename == '': flash('파일 선택 안됨.', 'error'); return redirect(url_for('index'))
-        if file and (file.filename.endswith('.xlsx') or file.filename.endswith('.xls')):
+        if file and file.filename.endswith(IMPORT_EXTENSIONS):
+            # 기본: .xlsx/.csv는 스트리밍(커밋 전까지 기존 카탈로그 유지), .xls는 전체 교체. replace는 명시적으로 선택할 때만
+            mode = request.form.get('import_mode') or ('replace' if file.filename.endswith('.xls') else 'stream')
+            if mode not in IMPORT_MODES: flash(f'알 수 없는 임포트 방식: {mode}', 'error'); return redirect(url_for('index'))
+            if mode == 'stream' and file.filename.endswith('.xls'): flash('스트리밍 임포트는 .xlsx/.csv 파일만 지원.', 'error'); return redirect(url_for('index'))
             try:
-                file_content = file.read()
-                df = pd.read_excel( io.BytesIO(file_content), sheet_name=0, dtype={'barcode': str, 'product_number': str}, keep_default_na=False )
-                required_cols_base = [ 'product_number', 'product_name', 'color', 'barcode', 'size', 'release_year', 'item_category', 'original_price', 'sale_price', 'store_stock', 'hq_stock']
-                excel_cols = list(df.columns)
-                if not all(col in excel_cols for col in required_cols_base):
-                     missing = [col for col in required_cols_base if col not in excel_cols]; flash(f"엑셀 컬럼명 오류. 누락: {missing}", 'error'); return redirect(url_for('index'))
-                if 'is_favorite' not in excel_cols: df['is_favorite'] = 0
-                else: df['is_favorite'] = pd.to_numeric(df['is_favorite'], errors='coerce').fillna(0).astype(int)
-
-                db.session.query(Variant).delete(); db.session.query(Product).delete(); db.session.commit()
-
-                product_cols = ['product_number', 'product_name', 'release_year', 'item_category', 'is_favorite']
-                actual_product_cols = [col for col in product_cols if col in df.columns]
-                products_df = df[actual_product_cols].drop_duplicates(subset=['product_number']).copy(); products_df.dropna(subset=['product_number'], inplace=True)
-                if 'release_year' in products_df.columns: products_df['release_year'] = pd.to_numeric(products_df['release_year'], errors='coerce').astype('Int64')
-                products_data = products_df.to_dict('records'); db.session.bulk_insert_mappings(Product, products_data)
-
-                variant_cols = [ 'barcode', 'product_number', 'color', 'size', 'store_stock', 'hq_stock', 'original_price', 'sale_price' ]
-                actual_variant_cols = [col for col in variant_cols if col in df.columns]
-                variants_df = df[actual_variant_cols].copy(); variants_df.dropna(subset=['barcode'], inplace=True)
-                for col in ['store_stock', 'hq_stock', 'original_price', 'sale_price']:
-                    if col in variants_df.columns: variants_df[col] = pd.to_numeric(variants_df[col], errors='coerce').fillna(0).astype(int)
-                variants_data = variants_df.to_dict('records'); db.session.bulk_insert_mappings(Variant, variants_data); db.session.commit()
-                flash(f"성공 ({file.filename}): {len(products_df)}개 상품, {len(variants_df)}개 SKU 임포트.", 'success')
+                flash(f"성공 ({file.filename}): {IMPORT_MODES[mode](file)}", 'success')
+            except ExcelImportError as e: db.session.rollback(); flash(str(e), 'error')
             except Exception as e: db.session.rollback(); flash(f"임포트 오류: {e}", 'error')
+            invalidate_search_index(); invalidate_columnar_snapshot(); catalog_cache.invalidate_all() # 실패해도 일부 커밋됐을 수 있으므로 항상 무효화
+            try: bump_catalog_version()
+            except Exception as e: db.session.rollback(); print(f"카탈로그 버전 갱신 실패: {e}")
             return redirect(url_for('index'))
-        else: flash('엑셀 파일만 업로드 가능.', 'error'); return redirect(url_for('index'))
+        else: flash('엑셀/CSV 파일만 업로드 가능.', 'error'); return redirect(url_for('index'))
     return redirect(url_for('index'))
 
-# --- 웹페이지 라우트 ---
+# --- 목록 페이지네이션 ---
+# 즐겨찾기/전체/상세검색: (item_category, product_name, product_number) 키셋 / 텍스트 검색: 관련도 순위 오프셋
+app.config['PAGE_SIZE'] = int(os.environ.get('PAGE_SIZE', 50))
+LIST_ORDER = (Product.item_category, Product.product_name, Product.product_number)
 
-@app.route('/')
-def index():
-    query = request.args.get('query', ''); showing_favorites = False
-    if query:
-        search_term = f'%{query}%'
-        products = Product.query.options(joinedload(Product.variants)).filter(
-            or_(Product.product_number.ilike(search_term), Product.product_name.ilike(search_term))
-        ).order_by(Product.product_name).all()
-    else:
-        showing_favorites = True
-        products = Product.query.options(joinedload(Product.variants)).filter(
-            Product.is_favorite == 1
-        ).order_by(Product.item_category, Product.product_name).all()
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, ensure_ascii=False).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    if not cursor: return None
+    try: return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError): return None
+
+def decode_keyset_cursor(cursor):
+    # LIST_ORDER 값(모두 문자열) 튜플. 형식이 다르면 커서 무시 (첫 페이지)
+    values = decode_cursor(cursor)
+    if isinstance(values, list) and len(values) == len(LIST_ORDER) and all(isinstance(value, str) for value in values): return tuple(values)
+    return None
+
+def keyset_page(query, cursor, page_size):
+    values = decode_keyset_cursor(cursor)
+    if values is not None: query = query.filter(tuple_(*LIST_ORDER) > values)
+    products = query.order_by(*LIST_ORDER).limit(page_size + 1).all()
+    next_cursor = encode_cursor([getattr(products[page_size - 1], col.key) for col in LIST_ORDER]) if len(products) > page_size else None
+    return products[:page_size], next_cursor
+
+def search_page(term, cursor, page_size):
+    values = decode_cursor(cursor)
+    offset = values[0] if isinstance(values, list) and len(values) == 1 and type(values[0]) is int and values[0] >= 0 else 0
+    product_numbers = search_product_numbers(term, limit=offset + page_size + 1)
+    next_cursor = encode_cursor([offset + page_size]) if len(product_numbers) > offset + page_size else None
+    return products_in_order(product_numbers[offset:offset + page_size]), next_cursor
+
+ADVANCED_FILTERS = [ # (파라미터, 대상, 컬럼, 연산, 라벨)
+    ('product_number', 'product', 'product_number', 'contains', '품번'),
+    ('product_name', 'product', 'product_name', 'contains', '품명'),
+    ('color', 'variant', 'color', 'contains', '색상'),
+    ('size', 'variant', 'size', 'contains', '사이즈'),
+    ('release_year', 'product', 'release_year', 'eq', '년도'),
+    ('item_category', 'product', 'item_category', 'contains', '품목'),
+    ('original_price_min', 'variant', 'original_price', 'ge', '최초가(min)'),
+    ('original_price_max', 'variant', 'original_price', 'le', '최초가(max)'),
+    ('sale_price_min', 'variant', 'sale_price', 'ge', '판매가(min)'),
+    ('sale_price_max', 'variant', 'sale_price', 'le', '판매가(max)'),
+    ('min_discount', 'variant', 'sale_price', 'discount', '할인율'),
+]
+
+def parse_advanced_filters(params):
+    # 상세검색 파라미터 -> ([(대상, 컬럼, 연산, 값)], 요약 문자열 리스트). 숫자 변환 실패/0% 할인은 무시
+    filters = []; query_summary_parts = []
+    for param, target, column, op, label in ADVANCED_FILTERS:
+        value = params.get(param)
+        if not value: continue
+        if op != 'contains':
+            try: value = int(value)
+            except ValueError: continue
+        if op == 'discount':
+            if value <= 0: continue
+            query_summary_parts.append(f"{label}: {value}% 이상")
+        else: query_summary_parts.append(f"{label}: {value}")
+        filters.append((target, column, op, value))
+    return filters, query_summary_parts
+
+def sql_condition(model, column, op, value):
+    col = getattr(model, column)
+    if op == 'contains': return col.icontains(value, autoescape=True) # '%', '_'도 글자 그대로 (컬럼형 엔진과 동일)
+    if op == 'eq': return col == value
+    if op == 'ge': return col >= value
+    if op == 'le': return col <= value
+    ratio = 1.0 - (value / 100.0)
+    return and_(Variant.original_price > 0, Variant.sale_price <= (Variant.original_price * ratio))
+
+def advanced_search_query(params):
+    # 상세검색 조건 -> (Product 쿼리 또는 None, 요약 문자열 리스트). SKU 조건은 같은 SKU에 모두 만족하는 EXISTS로 처리 (join+distinct 불필요)
+    filters, query_summary_parts = parse_advanced_filters(params)
+    if not filters: return None, []
+    query = Product.query.filter(*[sql_condition(Product, column, op, value) for target, column, op, value in filters if target == 'product'])
+    variant_conditions = [sql_condition(Variant, column, op, value) for target, column, op, value in filters if target == 'variant']
+    if variant_conditions: query = query.filter(Product.variants.any(and_(*variant_conditions)))
+    return query, query_summary_parts
+
+# --- 상세검색 컬럼형 엔진 ---
+# products/variants를 pandas 컬럼 스냅샷으로 들고 조건을 불리언 마스크로 평가 (ADVANCED_SEARCH_ENGINE=columnar)
+app.config['ADVANCED_SEARCH_ENGINE'] = os.environ.get('ADVANCED_SEARCH_ENGINE', 'sql') # sql | columnar
+app.config['COLUMNAR_SNAPSHOT_TTL'] = int(os.environ.get('COLUMNAR_SNAPSHOT_TTL', 300))
+columnar_state = {'snapshot': None, 'built_at': 0.0, 'version': None}
+COLUMNAR_TEXT_COLS = {'product': ['product_number', 'product_name', 'item_category'], 'variant': ['color', 'size']}
+
+def build_columnar_snapshot():
+    import pandas as pd
+    connection = db.session.connection()
+    products = pd.read_sql(db.select(Product.product_number, Product.product_name, Product.release_year, Product.item_category), connection)
+    variants = pd.read_sql(db.select(Variant.product_number, Variant.color, Variant.size, Variant.original_price, Variant.sale_price), connection)
+    for target, frame in [('product', products), ('variant', variants)]:
+        for col in COLUMNAR_TEXT_COLS[target]:
+            # 소문자 카테고리형으로 저장해 부분 일치를 고유값에 대해서만 계산
+            frame[col] = frame[col].fillna('').astype(str); frame[f'{col}_lower'] = frame[col].str.lower().astype('category')
+    for col in ['original_price', 'sale_price']: variants[col] = variants[col].fillna(0).astype('int64')
+    products['release_year'] = products['release_year'].astype('Int64')
+    products = products.sort_values(['item_category', 'product_name', 'product_number'], kind='stable').reset_index(drop=True)
+    # SKU -> 상품 행 위치 (SKU 마스크를 상품 마스크로 모을 때 사용)
+    variants['product_idx'] = variants['product_number'].map(pd.Series(products.index, index=products['product_number'])).fillna(-1).astype('int64')
+    variants = variants[variants['product_idx'] >= 0].reset_index(drop=True)
+    return {'product': products, 'variant': variants}
+
+def columnar_snapshot():
+    now = time.time(); version = shared_catalog_version()
+    if columnar_state['snapshot'] is None or columnar_state['version'] != version or now - columnar_state['built_at'] > app.config['COLUMNAR_SNAPSHOT_TTL']:
+        columnar_state['snapshot'] = build_columnar_snapshot(); columnar_state['built_at'] = now; columnar_state['version'] = version
+    return columnar_state['snapshot']
+
+def invalidate_columnar_snapshot():
+    columnar_state['snapshot'] = None
+
+def frame_mask(frame, column, op, value):
+    import numpy as np
+    if op == 'contains':
+        values = frame[f'{column}_lower']
+        return np.asarray(values.cat.categories.str.contains(str(value).lower(), regex=False), dtype=bool)[values.cat.codes.to_numpy()]
+    if op == 'eq': return (frame[column] == value).fillna(False).to_numpy(dtype=bool)
+    if op == 'ge': return (frame[column] >= value).to_numpy()
+    if op == 'le': return (frame[column] <= value).to_numpy()
+    ratio = 1.0 - (value / 100.0)
+    original = frame['original_price'].to_numpy(); sale = frame['sale_price'].to_numpy()
+    return (original > 0) & (sale <= original * ratio)
+
+def columnar_search(filters):
+    # 조건에 맞는 상품 행을 (item_category, product_name, product_number) 순서로 반환
+    import numpy as np
+    snapshot = columnar_snapshot(); products = snapshot['product']; variants = snapshot['variant']
+    mask = np.ones(len(products), dtype=bool)
+    for target, column, op, value in filters:
+        if target == 'product': mask &= frame_mask(products, column, op, value)
+    variant_filters = [f for f in filters if f[0] == 'variant']
+    if variant_filters:
+        variant_mask = np.ones(len(variants), dtype=bool)
+        for _, column, op, value in variant_filters: variant_mask &= frame_mask(variants, column, op, value)
+        product_hits = np.zeros(len(products), dtype=bool); product_hits[variants['product_idx'].to_numpy()[variant_mask]] = True
+        mask &= product_hits
+    return products.loc[mask, ['item_category', 'product_name', 'product_number']]
+
+def columnar_page(params, cursor, page_size):
+    filters, _ = parse_advanced_filters(params)
+    if not filters: return [], None
+    keys = list(columnar_search(filters).itertuples(index=False, name=None))
+    values = decode_keyset_cursor(cursor)
+    start = bisect.bisect_right(keys, values) if values is not None else 0
+    page_keys = keys[start:start + page_size]
+    next_cursor = encode_cursor(list(page_keys[-1])) if start + page_size < len(keys) else None
+    return products_in_order([key[2] for key in page_keys]), next_cursor
+
+def list_page(view, params):
+    cursor = params.get('cursor'); page_size = app.config['PAGE_SIZE']
+    if view == 'search': return search_page(params.get('query', ''), cursor, page_size)
+    if view == 'favorites': return keyset_page(Product.query.filter(Product.is_favorite == 1), cursor, page_size)
+    if view == 'all': return keyset_page(Product.query, cursor, page_size)
+    if view == 'advanced':
+        if app.config['ADVANCED_SEARCH_ENGINE'] == 'columnar': return columnar_page(params, cursor, page_size)
+        query, _ = advanced_search_query(params)
+        return keyset_page(query, cursor, page_size) if query is not None else ([], None)
+    raise ValueError(f'알 수 없는 목록: {view}')
+
+def product_summaries(product_numbers):
+    # 목록용 컬러/가격 요약 (product_summaries 기본키 조회, variants 집계 없음). 가격은 첫 SKU(최소 바코드) 기준
+    summaries = {product_number: {'colors': '', 'sale_price': None, 'original_price': None, 'discount': None} for product_number in product_numbers}
+    if not product_numbers: return summaries
+    rows = db.session.execute(db.select(ProductSummary.product_number, ProductSummary.colors, ProductSummary.first_sale_price, ProductSummary.first_original_price)
+                              .where(ProductSummary.product_number.in_(product_numbers), ProductSummary.variant_count > 0))
+    for product_number, colors, sale_price, original_price in rows:
+        summary = summaries[product_number]
+        summary['colors'] = colors or ''
+        summary['sale_price'] = sale_price or 0; summary['original_price'] = original_price or 0
+        summary['discount'] = int((1 - (summary['sale_price'] / summary['original_price'])) * 100) if summary['original_price'] > 0 else 0
+    return summaries
+
+# --- 카탈로그 캐시 ---
+# 상품 상세/목록 페이로드를 dict로 캐시 (LRU+TTL). CATALOG_CACHE_URL=redis://... 이면 워커 간 공유 백엔드 사용
+# 로컬 LRU는 무효화가 요청을 처리한 워커에만 적용되므로 WEB_CONCURRENCY > 1 이고 공유 백엔드가 없으면 캐시를 끔
+app.config['WEB_CONCURRENCY'] = int(os.environ.get('WEB_CONCURRENCY', 1))
+app.config['CATALOG_CACHE_TTL'] = int(os.environ.get('CATALOG_CACHE_TTL', 300)) # 0이면 캐시 끔
+app.config['CATALOG_CACHE_SIZE'] = int(os.environ.get('CATALOG_CACHE_SIZE', 1024))
+app.config['CATALOG_CACHE_URL'] = os.environ.get('CATALOG_CACHE_URL')
+
+class LRUCacheBackend:
+    # 프로세스 로컬 LRU + TTL 저장소 (공유 백엔드 대신 로컬 대역으로도 사용)
+    def __init__(self, max_size=1024):
+        self.max_size = max_size; self.entries = OrderedDict(); self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None: return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic(): del self.entries[key]; return None
+            self.entries.move_to_end(key); return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl if ttl else None); self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size: self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock: self.entries.pop(key, None)
+
+    def __len__(self): return len(self.entries)
+
+class RedisCacheBackend:
+    # 공유 캐시 (redis 패키지가 설치된 경우에만 사용)
+    def __init__(self, url):
+        import pickle, redis
+        self.pickle = pickle; self.client = redis.Redis.from_url(url)
 
+    def get(self, key):
+        value = self.client.get(key)
+        return None if value is None else self.pickle.loads(value)
+
+    def set(self, key, value, ttl=None): self.client.set(key, self.pickle.dumps(value), ex=ttl or None)
+    def delete(self, key): self.client.delete(key)
+    def __len__(self): return self.client.dbsize()
+
+class CatalogCache:
+    # 키 = 네임스페이스:버전:식별자. 네임스페이스/항목 버전을 올리면 해당 범위 전체가 무효화됨
+    # (무효화 전에 DB를 읽은 로더가 늦게 저장해도 이미 버려진 키에 쓰므로 오래된 값이 남지 않음)
+    def __init__(self, backend, ttl):
+        self.backend = backend; self.ttl = ttl
+        self.hits = {}; self.misses = {}; self.lock = threading.Lock()
+
+    def version(self, scope):
+        return self.backend.get(f'version:{scope}') or 0
+
+    def key(self, namespace, ident):
+        return f'{namespace}:{self.version("catalog")}.{self.version(namespace)}.{self.version(f"{namespace}:{ident}")}:{ident}'
+
+    def count(self, counter, namespace):
+        with self.lock: counter[namespace] = counter.get(namespace, 0) + 1
+
+    def get_or_load(self, namespace, ident, loader):
+        if not self.ttl: return loader()
+        key = self.key(namespace, ident); value = self.backend.get(key)
+        if value is not None: self.count(self.hits, namespace); return value
+        self.count(self.misses, namespace); value = loader()
+        if value is not None: self.backend.set(key, value, self.ttl)
+        return value
+
+    def invalidate(self, namespace, ident): self.backend.delete(self.key(namespace, ident)); self.invalidate_namespace(f'{namespace}:{ident}')
+    def invalidate_namespace(self, namespace): self.backend.set(f'version:{namespace}', time.time_ns())
+    def invalidate_all(self): self.invalidate_namespace('catalog')
+
+    def stats(self):
+        namespaces = sorted(set(self.hits) | set(self.misses))
+        return {'enabled': bool(self.ttl), 'backend': type(self.backend).__name__, 'size': len(self.backend),
+                'hits': sum(self.hits.values()), 'misses': sum(self.misses.values()),
+                'namespaces': {ns: {'hits': self.hits.get(ns, 0), 'misses': self.misses.get(ns, 0)} for ns in namespaces}}
+
+def create_catalog_cache():
+    backend = None
+    if app.config['CATALOG_CACHE_URL']:
+        try: backend = RedisCacheBackend(app.config['CATALOG_CACHE_URL']); print("공유 카탈로그 캐시 사용.")
+        except Exception as e: print(f"공유 캐시 초기화 실패 (로컬 캐시 사용): {e}")
+    ttl = app.config['CATALOG_CACHE_TTL']
+    if backend is None and ttl and app.config['WEB_CONCURRENCY'] > 1: print("워커가 여러 개이고 공유 캐시가 없어 카탈로그 캐시 끔 (CATALOG_CACHE_URL 설정 시 사용)."); ttl = 0
+    return CatalogCache(backend or LRUCacheBackend(app.config['CATALOG_CACHE_SIZE']), ttl)
+
+catalog_cache = create_catalog_cache()
+
+PRODUCT_FIELDS = ['product_number', 'product_name', 'is_favorite', 'release_year', 'item_category']
+VARIANT_FIELDS = ['barcode', 'product_number', 'color', 'size', 'store_stock', 'hq_stock', 'original_price', 'sale_price']
+
+def model_dict(obj, fields):
+    return {field: getattr(obj, field) for field in fields}
+
+def load_list_page(view, params):
+    products, next_cursor = list_page(view, params)
+    return {'products': [model_dict(product, PRODUCT_FIELDS) for product in products],
+            'summaries': product_summaries([product.product_number for product in products]), 'next_cursor': next_cursor}
+
+def cached_list_page(view, params):
+    # 목록은 임포트와 toggle_favorite(is_favorite 포함)에서만 바뀜 (재고는 목록에 표시되지 않음)
+    namespace = 'favorites' if view == 'favorites' else 'listing'
+    ident = json.dumps([view, sorted(params.items())], ensure_ascii=False)
+    return catalog_cache.get_or_load(namespace, ident, lambda: load_list_page(view, params))
+
+DETAIL_PRODUCT_COLS = [getattr(Product, field) for field in PRODUCT_FIELDS] + [Product.related_products]
+DETAIL_VARIANT_COLS = [getattr(Variant, field).label(f'variant_{field}') for field in VARIANT_FIELDS]
+
+def load_product_detail(product_number):
+    # 상품 + 정렬된 SKU를 한 번의 쿼리로 (ix_variants_product_size_order 순서 그대로, 관련 상품은 임포트 시 계산된 값)
+    rows = db.session.execute(db.select(*DETAIL_PRODUCT_COLS, *DETAIL_VARIANT_COLS)
+        .outerjoin(Variant, Variant.product_number == Product.product_number).where(Product.product_number == product_number)
+        .order_by(Variant.color, Variant.size_rank, Variant.size_key)).mappings().all()
+    if not rows: return None
+    return {'product': {field: rows[0][field] for field in PRODUCT_FIELDS},
+            'variants': [{field: row[f'variant_{field}'] for field in VARIANT_FIELDS} for row in rows if row['variant_barcode'] is not None],
+            'related_products': json.loads(rows[0]['related_products'] or '[]')}
+
+def cached_product_detail(product_number):
+    return catalog_cache.get_or_load('product', product_number, lambda: load_product_detail(product_number))
+
+def render_product_list(page, list_params, **context):
     return render_template(
         'index.html',
-        products=products,
+        products=page['products'],
+        summaries=page['summaries'],
+        next_cursor=page['next_cursor'],
+        list_api_url=url_for('product_list_api', **list_params),
+        is_direct_search_page=False,
+        **context
+    )
+
+# --- 카탈로그 내보내기 ---
+# import_excel과 같은 컬럼 구성으로 내보냄 (그대로 다시 임포트 가능). 서버 측 커서로 EXPORT_BATCH_SIZE행씩 읽어 메모리 사용량 일정
+EXPORT_COLS = REQUIRED_COLS + ['is_favorite']
+EXPORT_BATCH_SIZE = 2000
+
+def export_rows():
+    # SKU 없는 상품(바코드 빈 행으로 임포트된 상품)도 바코드 빈 행으로 내보내야 재임포트 때 삭제되지 않음
+    stmt = db.select(*[getattr(Product if col in PRODUCT_COLS else Variant, col) for col in EXPORT_COLS]) \
+        .outerjoin(Variant, Variant.product_number == Product.product_number) \
+        .order_by(Product.product_number, Variant.barcode).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    for partition in db.session.execute(stmt).partitions(): yield from partition
+
+def stream_csv():
+    buffer = io.StringIO(); writer = csv.writer(buffer)
+    buffer.write('\ufeff'); writer.writerow(EXPORT_COLS) # 엑셀에서 한글이 깨지지 않도록 BOM
+    for index, row in enumerate(export_rows(), 1):
+        writer.writerow(['' if value is None else value for value in row])
+        if index % EXPORT_BATCH_SIZE == 0: yield buffer.getvalue().encode('utf-8'); buffer.seek(0); buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def stream_xlsx():
+    # openpyxl write-only 모드는 행을 임시 파일로 흘려 쓰므로 메모리가 일정. 저장된 파일을 청크로 전송
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True); sheet = workbook.create_sheet('catalog')
+    sheet.append(EXPORT_COLS)
+    for row in export_rows(): sheet.append(list(row))
+    with tempfile.TemporaryFile(dir=app.config['UPLOAD_FOLDER']) as output:
+        workbook.save(output); output.seek(0)
+        while True:
+            chunk = output.read(64 * 1024)
+            if not chunk: break
+            yield chunk
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+@app.route('/export')
+def export_catalog():
+    export_format = request.args.get('format', 'xlsx')
+    if export_format not in EXPORT_FORMATS: flash(f'지원하지 않는 형식: {export_format}', 'error'); return redirect(url_for('index'))
+    generator, mimetype = EXPORT_FORMATS[export_format]
+    filename = f"wasabi_catalog_{time.strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    return app.response_class(stream_with_context(generator()), mimetype=mimetype, headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+# --- 웹페이지 라우트 ---
+
+@app.route('/')
+def index():
+    query = request.args.get('query', ''); showing_favorites = not query
+    view = 'search' if query else 'favorites'
+    return render_product_list(
+        cached_list_page(view, request.args), {'view': view, 'query': query} if query else {'view': view},
         query=query,
         showing_favorites=showing_favorites,
         showing_all=False,
-        is_direct_search_page=False,
         advanced_search_params={}
     )
 
 @app.route('/all_products')
 def all_products():
     try:
-        products = Product.query.options(joinedload(Product.variants)).order_by(Product.item_category, Product.product_name).all()
-        return render_template(
-            'index.html',
-            products=products,
+        return render_product_list(
+            cached_list_page('all', request.args), {'view': 'all'},
             query="전체 목록",
             showing_favorites=False,
             showing_all=True,
-            is_direct_search_page=False,
             advanced_search_params={}
         )
     except Exception as e:
         flash(f"전체 목록 조회 오류: {e}", 'error')
         return redirect(url_for('index'))
 
+@app.route('/dashboard')
+def category_dashboard():
+    # 카테고리별 상품/재고/금액 합계 (product_summaries만 집계)
+    rows = db.session.execute(db.select(
+        ProductSummary.item_category, func.count().label('product_count'), func.sum(ProductSummary.is_favorite).label('favorite_count'),
+        func.sum(ProductSummary.variant_count).label('variant_count'), func.sum(ProductSummary.total_store_stock).label('store_stock'),
+        func.sum(ProductSummary.total_hq_stock).label('hq_stock'), func.sum(ProductSummary.store_stock_value).label('store_value'),
+        func.sum(ProductSummary.hq_stock_value).label('hq_value'), func.max(ProductSummary.max_discount).label('max_discount'),
+    ).group_by(ProductSummary.item_category).order_by(ProductSummary.item_category)).mappings().all()
+    # Postgres SUM(bigint)은 numeric(Decimal)으로 돌아오므로 int로 맞춤 (템플릿의 {:,d} 포맷)
+    categories = [{key: int(value or 0) if key != 'item_category' else value for key, value in row.items()} for row in rows]
+    totals = {key: sum(category[key] for category in categories) for key in ['product_count', 'favorite_count', 'variant_count', 'store_stock', 'hq_stock', 'store_value', 'hq_value']}
+    totals['max_discount'] = max([category['max_discount'] for category in categories], default=0)
+    return render_template('dashboard.html', categories=categories, totals=totals, is_direct_search_page=False)
+
 @app.route('/advanced_search')
 def advanced_search():
     try:
-        query = Product.query.options(joinedload(Product.variants)).join(Product.variants)
-
         params = request.args
-        search_active = False
-        query_summary_parts = []
-
-        # --- Apply filters ---
-        if params.get('product_number'):
-            value = params.get('product_number')
-            query = query.filter(Product.product_number.ilike(f"%{value}%"))
-            search_active = True; query_summary_parts.append(f"품번: {value}")
-        if params.get('product_name'):
-            value = params.get('product_name')
-            query = query.filter(Product.product_name.ilike(f"%{value}%"))
-            search_active = True; query_summary_parts.append(f"품명: {value}")
-        if params.get('color'):
-            value = params.get('color')
-            query = query.filter(Variant.color.ilike(f"%{value}%"))
-            search_active = True; query_summary_parts.append(f"색상: {value}")
-        if params.get('size'):
-            value = params.get('size')
-            query = query.filter(Variant.size.ilike(f"%{value}%"))
-            search_active = True; query_summary_parts.append(f"사이즈: {value}")
-        if params.get('release_year'):
-            try:
-                year = int(params.get('release_year'))
-                query = query.filter(Product.release_year == year)
-                search_active = True; query_summary_parts.append(f"년도: {year}")
-            except ValueError: pass
-        if params.get('item_category'):
-            value = params.get('item_category')
-            query = query.filter(Product.item_category.ilike(f"%{value}%"))
-            search_active = True; query_summary_parts.append(f"품목: {value}")
-        if params.get('original_price_min'):
-            try:
-                value = int(params.get('original_price_min'))
-                query = query.filter(Variant.original_price >= value)
-                search_active = True; query_summary_parts.append(f"최초가(min): {value}")
-            except ValueError: pass
-        if params.get('original_price_max'):
-            try:
-                value = int(params.get('original_price_max'))
-                query = query.filter(Variant.original_price <= value)
-                search_active = True; query_summary_parts.append(f"최초가(max): {value}")
-            except ValueError: pass
-        if params.get('sale_price_min'):
-            try:
-                value = int(params.get('sale_price_min'))
-                query = query.filter(Variant.sale_price >= value)
-                search_active = True; query_summary_parts.append(f"판매가(min): {value}")
-            except ValueError: pass
-        if params.get('sale_price_max'):
-            try:
-                value = int(params.get('sale_price_max'))
-                query = query.filter(Variant.sale_price <= value)
-                search_active = True; query_summary_parts.append(f"판매가(max): {value}")
-            except ValueError: pass
-        if params.get('min_discount'):
-            try:
-                min_discount_percent = int(params.get('min_discount'))
-                if min_discount_percent > 0:
-                    ratio = 1.0 - (min_discount_percent / 100.0)
-                    query = query.filter(Variant.original_price > 0)
-                    query = query.filter(Variant.sale_price <= (Variant.original_price * ratio))
-                    search_active = True; query_summary_parts.append(f"할인율: {min_discount_percent}% 이상")
-            except ValueError: pass
-
-        if not search_active:
-            products = []
+        query, query_summary_parts = advanced_search_query(params)
+        if query is None:
+            page = {'products': [], 'summaries': {}, 'next_cursor': None}
             query_summary = "상세 검색: 조건 없음"
         else:
-            products = query.distinct().order_by(Product.product_name).all()
+            page = cached_list_page('advanced', params)
             query_summary = f"상세 검색: {', '.join(query_summary_parts)}"
 
-        return render_template(
-            'index.html',
-            products=products,
+        return render_product_list(
+            page, {'view': 'advanced', **{key: value for key, value in params.items() if key != 'cursor'}},
             query=query_summary,
             showing_favorites=False,
             showing_all=False,
-            is_direct_search_page=False,
             advanced_search_params=params
         )
     except Exception as e:
@@ -263,13 +1066,12 @@ def find_product():
         flash('품번을 입력해주세요.', 'error')
         return redirect(url_for('direct_search'))
 
-    search_term = f'%{product_number_query}%'
-    # 대소문자 구분 없이 부분 일치 검색
-    results = Product.query.filter(Product.product_number.ilike(search_term)).all()
+    # 대소문자/'-' 구분 없이 품번 부분 일치 검색 (2건이면 충분)
+    results = search_product_numbers(product_number_query, fields=('number',), limit=2)
 
     if len(results) == 1:
         # 정확히 1개 찾으면 상세 페이지로 이동
-        return redirect(url_for('product_detail', product_number=results[0].product_number))
+        return redirect(url_for('product_detail', product_number=results[0]))
     elif len(results) > 1:
         # 여러 개 찾으면 검색 결과 목록 페이지(index)로 이동
         flash(f'"{product_number_query}"(으)로 시작하는 품번이 여러 개 있습니다.', 'info')
@@ -281,79 +1083,178 @@ def find_product():
         return redirect(url_for('direct_search'))
 
 
-# 정렬 함수
-def get_sort_key(variant):
-    color = variant.color or ''; size_str = str(variant.size).upper().strip()
-    if size_str == '2XS': size_str = 'XXS'
-    elif size_str == '2XL': size_str = 'XXL'
-    elif size_str == '3XL': size_str = 'XXXL'
-    custom_order = ['XXS', 'XS', 'S', 'M', 'L', 'XL', 'XXL', 'XXXL']
-    if size_str.isdigit(): sort_key = (1, int(size_str), '')
-    elif size_str in custom_order: sort_key = (2, custom_order.index(size_str), '')
-    else: sort_key = (3, 0, size_str)
-    return (color, sort_key)
-
 @app.route('/product/<product_number>')
 def product_detail(product_number):
-    product = Product.query.get(product_number)
-    if product is None: flash("상품 없음.", 'error'); return redirect(url_for('index'))
-    image_product_number = product.product_number.split(' ')[0]
-    image_url = f"{IMAGE_URL_PREFIX}{image_product_number}.jpg"; variants_list = sorted(product.variants, key=get_sort_key); related_products = []
-    if product.product_name:
-        search_words = product.product_name.split(' ');
-        if search_words:
-            search_term = search_words[-1]
-            if len(search_term) > 1:
-                related_products = Product.query.filter( Product.product_name.ilike(f'%{search_term}%'), Product.product_number != product_number ).limit(5).all()
+    detail = cached_product_detail(product_number)
+    if detail is None: flash("상품 없음.", 'error'); return redirect(url_for('index'))
+    image_product_number = product_number.split(' ')[0]
+    image_url = f"{IMAGE_URL_PREFIX}{image_product_number}.jpg"
 
     return render_template(
         'detail.html',
-        product=product,
+        product=detail['product'],
         image_url=image_url,
-        variants=variants_list,
-        related_products=related_products,
+        variants=detail['variants'],
+        related_products=detail['related_products'],
         showing_all=False,
         is_direct_search_page=False,
         advanced_search_params={}
     )
 
+# --- OCR 파이프라인 ---
+# 내용 해시로 결과 캐시 + 동일 이미지 동시 요청 병합 -> 제한된 스레드 풀에서 축소/재인코딩 후 타임아웃과 함께 호출
+# 실행+대기 중 호출이 OCR_MAX_PENDING개를 넘으면 바로 거절하고, 모든 요청이 시간 초과로 떠난 호출은 대기열에서 취소
+app.config['OCR_BACKEND'] = os.environ.get('OCR_BACKEND', 'google') # google | stub | (text를 돌려주는 callable)
+app.config['OCR_MAX_DIMENSION'] = int(os.environ.get('OCR_MAX_DIMENSION', 1600))
+app.config['OCR_TIMEOUT'] = float(os.environ.get('OCR_TIMEOUT', 15))
+app.config['OCR_WORKERS'] = int(os.environ.get('OCR_WORKERS', 4))
+app.config['OCR_CACHE_TTL'] = int(os.environ.get('OCR_CACHE_TTL', 3600))
+app.config['OCR_MAX_PENDING'] = int(os.environ.get('OCR_MAX_PENDING', app.config['OCR_WORKERS'] * 2))
+
+class OCRError(Exception):
+    pass
+
+class OCRTimeout(OCRError):
+    pass
+
+class OCRBusy(OCRError):
+    pass
+
+# Google Cloud 인증 정보 경로 설정 (클라이언트는 첫 OCR 요청 때 생성: google-cloud-vision/grpc 임포트가 무거움)
+GCP_CREDENTIALS_PATH = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
+vision_client = None
+vision_state = {'initialized': False}; vision_lock = threading.Lock()
+
+def create_vision_client():
+    from google.cloud import vision
+    from google.oauth2 import service_account
+    if GCP_CREDENTIALS_PATH and os.path.exists(GCP_CREDENTIALS_PATH):
+        try:
+            credentials = service_account.Credentials.from_service_account_file(GCP_CREDENTIALS_PATH)
+            client = vision.ImageAnnotatorClient(credentials=credentials)
+            print("Google Cloud Vision Client initialized successfully."); return client
+        except Exception as e:
+            print(f"Error initializing Google Cloud Vision Client: {e}")
+    else:
+        print("GOOGLE_APPLICATION_CREDENTIALS not set or invalid.")
+        local_key_path = 'gcp_credentials.json' # 로컬 테스트용 키 파일 이름
+        if os.path.exists(local_key_path):
+            try:
+                credentials = service_account.Credentials.from_service_account_file(local_key_path)
+                client = vision.ImageAnnotatorClient(credentials=credentials)
+                print("Initialized local Google Vision Client."); return client
+            except Exception as e:
+                print(f"Error initializing local Google Vision Client: {e}")
+    return None
+
+def get_vision_client():
+    # 한 번만 생성 시도 (실패해도 매 요청 재시도하지 않음). 테스트에서 vision_client를 직접 대입하면 그대로 사용
+    global vision_client
+    if vision_client is None and not vision_state['initialized']:
+        with vision_lock:
+            if not vision_state['initialized']: vision_client = create_vision_client(); vision_state['initialized'] = True
+    return vision_client
+
+def google_vision_ocr(content):
+    client = get_vision_client()
+    if client is None: raise OCRError('Google Cloud Vision 클라이언트 초기화 실패.')
+    from google.cloud import vision
+    response = client.text_detection(image=vision.Image(content=content)); texts = response.text_annotations
+    if response.error.message: raise OCRError(f'Vision API Error: {response.error.message}')
+    return texts[0].description if texts else ''
+
+def stub_ocr(content):
+    # 로컬/테스트용 대역: OCR_STUB_TEXT 값을 인식 결과로 반환
+    return os.environ.get('OCR_STUB_TEXT', '')
+
+OCR_BACKENDS = {'google': google_vision_ocr, 'stub': stub_ocr}
+ocr_executor = ThreadPoolExecutor(max_workers=app.config['OCR_WORKERS'], thread_name_prefix='ocr')
+ocr_cache = LRUCacheBackend(max_size=512)
+ocr_inflight = {}; ocr_state = {'pending': 0}; ocr_lock = threading.Lock() # ocr_inflight: digest -> [future, 기다리는 요청 수]
+
+def ocr_backend():
+    backend = app.config['OCR_BACKEND']
+    if callable(backend): return backend
+    if backend not in OCR_BACKENDS: raise OCRError(f'알 수 없는 OCR 백엔드: {backend}')
+    return OCR_BACKENDS[backend]
+
+def prepare_ocr_image(content):
+    # 긴 변을 OCR_MAX_DIMENSION 이하로 줄이고 그레이스케일 JPEG로 재인코딩 (Vision API 전송량/지연 감소)
+    try:
+        from PIL import Image, ImageOps
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(content)))
+        max_dimension = app.config['OCR_MAX_DIMENSION']; image.thumbnail((max_dimension, max_dimension))
+        output = io.BytesIO(); image.convert('L').save(output, format='JPEG', quality=85, optimize=True)
+        return output.getvalue()
+    except Exception as e: print(f"OCR image preprocessing skipped: {e}"); return content
+
+def ocr_task(backend, content):
+    # 전처리도 풀 스레드에서 (요청 스레드/ocr_lock을 붙잡지 않음)
+    return backend(prepare_ocr_image(content))
+
+def run_ocr(content):
+    digest = hashlib.sha256(content).hexdigest()
+    cached = ocr_cache.get(digest)
+    if cached is not None: print("OCR cache hit."); return cached
+    backend = ocr_backend(); submitted = False
+    with ocr_lock:
+        entry = ocr_inflight.get(digest)
+        if entry is None:
+            if ocr_state['pending'] >= app.config['OCR_MAX_PENDING']: raise OCRBusy('OCR 요청이 많음. 잠시 후 다시 시도.')
+            entry = ocr_inflight[digest] = [ocr_executor.submit(ocr_task, backend, content), 0]; ocr_state['pending'] += 1; submitted = True
+        entry[1] += 1; future = entry[0]
+    if submitted: future.add_done_callback(lambda done: finish_ocr(digest, done)) # 이미 끝났으면 즉시 호출되므로 락 밖에서 등록
+    try: return future.result(timeout=app.config['OCR_TIMEOUT'])
+    except FutureTimeoutError:
+        with ocr_lock:
+            entry[1] -= 1; abandoned = entry[1] == 0 and ocr_inflight.get(digest) is entry
+            if abandoned: del ocr_inflight[digest]
+        if abandoned: future.cancel() # 아직 대기열에 있으면 실행하지 않음 (실행 중이면 끝까지 돌고 결과만 캐시)
+        raise OCRTimeout(f"OCR 시간 초과 ({app.config['OCR_TIMEOUT']}초).")
+
+def finish_ocr(digest, future):
+    # 시간 초과로 요청이 먼저 끝나도 결과는 캐시에 남겨 재업로드 시 재사용
+    with ocr_lock:
+        ocr_state['pending'] -= 1
+        if ocr_inflight.get(digest, [None])[0] is future: del ocr_inflight[digest]
+    if not future.cancelled() and future.exception() is None: ocr_cache.set(digest, future.result(), app.config['OCR_CACHE_TTL'])
+
 # --- API 라우트 ---
 @app.route('/barcode_search', methods=['POST'])
 def barcode_search():
     data = request.json; barcode = data.get('barcode')
     if not barcode: return jsonify({'status': 'error', 'message': '바코드 없음.'}), 400
-    scanned_clean = barcode.replace('-', '').strip()
+    scanned_clean = normalize_key(barcode)
     if len(scanned_clean) < 11: return jsonify({'status': 'error', 'message': f'바코드 짧음 ({len(scanned_clean)}자리).'}), 400
-    variant = Variant.query.filter( func.replace(Variant.barcode, '-', '').startswith(scanned_clean) ).first()
+    variant = Variant.query.filter( prefix_filter(Variant.barcode_key, scanned_clean) ).first()
     if variant: return jsonify({'status': 'success', 'product_number': variant.product_number})
     else: return jsonify({'status': 'error', 'message': 'DB에 일치하는 바코드 없음.'}), 404
 
 @app.route('/ocr_upload', methods=['POST'])
 def ocr_upload():
-    if vision_client is None: return jsonify({'status': 'error', 'message': 'Google Cloud Vision 클라이언트 초기화 실패.'}), 500
     if 'ocr_image' not in request.files: return jsonify({'status': 'error', 'message': '이미지 파일 없음.'}), 400
     file = request.files['ocr_image']
     if file.filename == '': return jsonify({'status': 'error', 'message': '파일 이름 없음.'}), 400
     if file:
         try:
-            content = file.read(); image = vision.Image(content=content)
-            response = vision_client.text_detection(image=image); texts = response.text_annotations
-            if response.error.message: raise Exception(f'Vision API Error: {response.error.message}')
-            if texts:
-                ocr_text = texts[0].description; print(f"Google Vision OCR Raw Text: {ocr_text}")
+            ocr_text = run_ocr(file.read())
+            if ocr_text:
+                print(f"OCR Raw Text: {ocr_text}")
                 cleaned_text = ocr_text.upper().replace('\n', ' ').replace('\r', ' '); cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
                 product_number_pattern = r'\bM[A-Z0-9-]{4,}\b'; matches = re.findall(product_number_pattern, cleaned_text); print(f"Found Product Number Candidates: {matches}")
                 if matches:
-                    search_text_raw = matches[0]; cleaned_search_text = search_text_raw.replace('-', '')
+                    search_text_raw = matches[0]; cleaned_search_text = normalize_key(search_text_raw)
                     if len(cleaned_search_text) < 5: return jsonify({'status': 'error', 'message': f'찾은 품번 패턴 "{search_text_raw}" 짧음.'}), 400
                     print(f"Searching DB with cleaned prefix: {cleaned_search_text}")
-                    results = Product.query.filter( func.replace(Product.product_number, '-', '').startswith(cleaned_search_text) ).all(); print(f"Found: {len(results)}")
+                    results = Product.query.filter( prefix_filter(Product.product_number_key, cleaned_search_text) ).limit(2).all(); print(f"Found: {len(results)}")
                     if len(results) == 1: return jsonify({'status': 'found_one', 'product_number': results[0].product_number})
                     elif len(results) > 1: return jsonify({'status': 'found_many', 'query': search_text_raw})
                     else: return jsonify({'status': 'not_found', 'message': f'"{cleaned_search_text}"(으)로 시작 상품 없음.'}), 404
                 else: return jsonify({'status': 'error', 'message': 'OCR 결과에서 품번 패턴(M...) 못 찾음.'}), 400
-            else: return jsonify({'status': 'error', 'message': 'Google Vision API가 텍스트 감지 못함.'}), 400
-        except Exception as e: print(f"Server OCR Error (Google Vision): {e}"); return jsonify({'status': 'error', 'message': f'서버 OCR 오류: {e}'}), 500
+            else: return jsonify({'status': 'error', 'message': 'OCR이 텍스트를 감지하지 못함.'}), 400
+        except OCRTimeout as e: print(f"Server OCR Timeout: {e}"); return jsonify({'status': 'error', 'message': f'서버 OCR 오류: {e}'}), 504
+        except OCRBusy as e: print(f"Server OCR Busy: {e}"); return jsonify({'status': 'error', 'message': f'서버 OCR 오류: {e}'}), 503
+        except Exception as e: print(f"Server OCR Error: {e}"); return jsonify({'status': 'error', 'message': f'서버 OCR 오류: {e}'}), 500
     return jsonify({'status': 'error', 'message': '파일 처리 중 알 수 없는 오류.'}), 500
 
 @app.route('/text_search', methods=['POST'])
@@ -362,34 +1263,82 @@ def text_search():
     text_raw = data.get('text', '').strip()
     if not text_raw:
         return jsonify({'status': 'error', 'message': '검색할 텍스트가 없습니다.'}), 400
-    search_term_asis = f'%{text_raw}%'
-    text_cleaned = text_raw.replace(' ', '')
-    search_term_cleaned = f'%{text_cleaned}%'
-    results = Product.query.filter(
-        or_(
-            Product.product_name.ilike(search_term_asis),
-            Product.product_number.ilike(search_term_asis),
-            Product.product_number.ilike(search_term_cleaned)
-        )
-    ).all()
+    results = search_product_numbers(text_raw, limit=2)
     if len(results) == 1:
-        return jsonify({'status': 'found_one', 'product_number': results[0].product_number})
+        return jsonify({'status': 'found_one', 'product_number': results[0]})
     elif len(results) > 1:
         return jsonify({'status': 'found_many', 'query': text_raw})
     else:
         return jsonify({'status': 'not_found', 'message': f'"{text_raw}" 포함 상품 없음.'}), 404
 
+@app.route('/api/products')
+def product_list_api():
+    # 무한 스크롤용 목록 페이지 (view: favorites | all | search | advanced)
+    try: page = cached_list_page(request.args.get('view', 'all'), request.args)
+    except ValueError as e: return jsonify({'status': 'error', 'message': str(e)}), 400
+    items = [{
+        **product,
+        'url': url_for('product_detail', product_number=product['product_number']),
+        'image_url': f"{IMAGE_URL_PREFIX}{product['product_number'].split(' ')[0]}.jpg",
+        **page['summaries'][product['product_number']]
+    } for product in page['products']]
+    return jsonify({'status': 'success', 'products': items, 'next_cursor': page['next_cursor']})
+
+@app.route('/api/cache_stats')
+def cache_stats():
+    return jsonify({'status': 'success', **catalog_cache.stats()})
+
+# --- 재고 조정 ---
+STOCK_BATCH_LIMIT = 500
+
+def greatest(*values):
+    return func.greatest(*values) if db.engine.dialect.name == 'postgresql' else func.max(*values)
+
+def apply_stock_changes(changes):
+    # {바코드: 증감} 을 원자적 UPDATE ... SET store_stock = GREATEST(0, store_stock + :d) 로 한 트랜잭션에 반영
+    # (DB에서 읽고 쓰므로 여러 기기의 동시 클릭도 유실되지 않음). 반환: ({바코드: 새 재고}, [없는 바코드])
+    results = {}; missing = []; touched_products = set()
+    for barcode, change in sorted(changes.items()): # 바코드 순서로 잠가 동시 배치 간 교착 방지
+        stmt = update(Variant).where(Variant.barcode == barcode).values(store_stock=greatest(0, func.coalesce(Variant.store_stock, 0) + change)).returning(Variant.store_stock, Variant.product_number)
+        row = db.session.execute(stmt).first()
+        if row is None: missing.append(barcode); continue
+        results[barcode] = row.store_stock; touched_products.add(row.product_number)
+    if touched_products: refresh_summary_stock(touched_products)
+    db.session.commit()
+    for product_number in touched_products: catalog_cache.invalidate('product', product_number)
+    return results, missing
+
+def parse_stock_changes(items):
+    # [{'barcode':..., 'change':...}, ...] -> 바코드별 합산 {바코드: 증감}
+    if not isinstance(items, list) or not items: raise ValueError('변경 항목 없음.')
+    if len(items) > STOCK_BATCH_LIMIT: raise ValueError(f'한 번에 최대 {STOCK_BATCH_LIMIT}건.')
+    changes = {}
+    for item in items:
+        barcode = item.get('barcode') if isinstance(item, dict) else None
+        if not barcode or item.get('change') is None: raise ValueError('필수 데이터 누락.')
+        changes[barcode] = changes.get(barcode, 0) + int(item.get('change'))
+    return {barcode: change for barcode, change in changes.items() if change != 0}
+
+@app.route('/update_stock_batch', methods=['POST'])
+def update_stock_batch():
+    data = request.get_json(silent=True) # application/json만 받음 (text/plain 등 preflight 없는 교차 출처 요청 거부)
+    if not isinstance(data, dict): return jsonify({'status': 'error', 'message': '변경 항목 없음.'}), 400
+    try: changes = parse_stock_changes(data.get('items'))
+    except (ValueError, TypeError) as e: return jsonify({'status': 'error', 'message': str(e)}), 400
+    try:
+        results, missing = apply_stock_changes(changes)
+        return jsonify({'status': 'success', 'quantities': results, 'missing': missing})
+    except Exception as e: db.session.rollback(); return jsonify({'status': 'error', 'message': f'서버 오류: {e}'}), 500
+
 @app.route('/update_stock', methods=['POST'])
 def update_stock():
     data = request.json; barcode = data.get('barcode'); change = data.get('change')
     if not barcode or change is None: return jsonify({'status': 'error', 'message': '필수 데이터 누락.'}), 400
     try:
         change = int(change); assert change in [1, -1]
-        item = Variant.query.filter_by(barcode=barcode).first()
-        if item is None: return jsonify({'status': 'error', 'message': '상품(바코드) 없음.'}), 404
-        current_stock = item.store_stock; new_stock = max(0, current_stock + change)
-        item.store_stock = new_stock; db.session.commit()
-        return jsonify({'status': 'success', 'new_quantity': new_stock, 'barcode': barcode})
+        results, missing = apply_stock_changes({barcode: change})
+        if missing: return jsonify({'status': 'error', 'message': '상품(바코드) 없음.'}), 404
+        return jsonify({'status': 'success', 'new_quantity': results[barcode], 'barcode': barcode})
     except Exception as e: db.session.rollback(); return jsonify({'status': 'error', 'message': f'서버 오류: {e}'}), 500
 
 @app.route('/toggle_favorite', methods=['POST'])
@@ -400,21 +1349,212 @@ def toggle_favorite():
         product = Product.query.get(product_number)
         if product is None: return jsonify({'status': 'error', 'message': '상품 없음.'}), 404
         product.is_favorite = 1 - product.is_favorite; new_status = product.is_favorite
-        db.session.commit()
+        db.session.execute(update(ProductSummary).where(ProductSummary.product_number == product_number).values(is_favorite=new_status))
+        db.session.commit(); catalog_cache.invalidate('product', product_number); catalog_cache.invalidate_namespace('favorites'); catalog_cache.invalidate_namespace('listing')
         return jsonify({'status': 'success', 'new_favorite_status': new_status})
     except Exception as e: db.session.rollback(); return jsonify({'status': 'error', 'message': f'서버 오류: {e}'}), 500
 
+# --- 성능 계측 ---
+# 라우트별 지연 히스토그램, 요청당 쿼리 수/시간, 템플릿 렌더 시간, 느린 쿼리 로그 -> /metrics (Prometheus 텍스트 형식)
+# 값은 워커 프로세스별로 따로 쌓임: /metrics는 요청을 받은 워커 하나의 값만 반환하므로 wasabi_worker_info의 pid로 구분해 합산
+# METRICS_ENABLED=0 이면 훅을 아예 등록하지 않음
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 200))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name; self.help_text = help_text; self.label_names = label_names; self.buckets = buckets
+        self.series = {}; self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            counts, total = self.series.get(labels) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.series[labels] = (counts, total + value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock: series = {labels: (list(counts), total) for labels, (counts, total) in self.series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            label_text = ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = label_text + ',' if label_text else ''; cumulative = 0
+            for bound, count in zip(list(self.buckets) + ['+Inf'], counts):
+                cumulative += count; lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}'); lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name; self.help_text = help_text; self.label_names = label_names
+        self.values = {}; self.lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self.lock: self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self.lock: values = dict(self.values)
+        for labels, value in sorted(values.items()):
+            label_text = ','.join(f'{name}="{escape_label(v)}"' for name, v in zip(self.label_names, labels))
+            lines.append(f'{self.name}{{{label_text}}} {value}')
+        return lines
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+REQUEST_LATENCY = Histogram('wasabi_request_duration_seconds', '라우트별 요청 처리 시간', ('endpoint', 'method', 'status'), LATENCY_BUCKETS)
+REQUEST_QUERIES = Histogram('wasabi_request_queries', '요청당 SQL 쿼리 수 (N+1 감지용)', ('endpoint',), QUERY_COUNT_BUCKETS)
+REQUEST_QUERY_TIME = Histogram('wasabi_request_query_seconds', '요청당 SQL 실행 시간 합계', ('endpoint',), LATENCY_BUCKETS)
+TEMPLATE_RENDER = Histogram('wasabi_template_render_seconds', '템플릿 렌더 시간', ('template',), LATENCY_BUCKETS)
+SLOW_QUERIES = Counter('wasabi_slow_queries_total', '느린 쿼리 수 (SLOW_QUERY_MS 초과)', ('endpoint',))
+
+def metrics_endpoint():
+    return (request.endpoint or 'unknown') if has_request_context() else 'background'
+
+def on_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # 시작 시각은 실행 컨텍스트에 저장 (문장이 실패해도 연결에 쌓이지 않음)
+    context.metrics_query_start = time.perf_counter()
+
+def on_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.metrics_query_start
+    if has_request_context() and 'metrics' in g: g.metrics['queries'] += 1; g.metrics['query_time'] += elapsed
+    if elapsed * 1000 >= app.config['SLOW_QUERY_MS']:
+        SLOW_QUERIES.inc((metrics_endpoint(),))
+        print(f"[SLOW QUERY] {elapsed * 1000:.1f}ms ({metrics_endpoint()}): {' '.join(statement.split())[:500]}")
+
+def on_request_start():
+    g.metrics = {'start': time.perf_counter(), 'queries': 0, 'query_time': 0.0, 'templates': []}
+
+def on_request_end(exc):
+    metrics = g.pop('metrics', None)
+    if metrics is None: return
+    endpoint = metrics_endpoint()
+    REQUEST_LATENCY.observe((endpoint, request.method, getattr(g, 'metrics_status', 500 if exc else 200)), time.perf_counter() - metrics['start'])
+    REQUEST_QUERIES.observe((endpoint,), metrics['queries']); REQUEST_QUERY_TIME.observe((endpoint,), metrics['query_time'])
+
+def on_response(response):
+    g.metrics_status = response.status_code
+    return response
+
+def on_before_render_template(sender, template, context, **extra):
+    if 'metrics' in g: g.metrics['templates'].append(time.perf_counter())
+
+def on_template_rendered(sender, template, context, **extra):
+    if 'metrics' in g and g.metrics['templates']: TEMPLATE_RENDER.observe((template.name,), time.perf_counter() - g.metrics['templates'].pop())
+
+def setup_metrics():
+    event.listen(Engine, 'before_cursor_execute', on_before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', on_after_cursor_execute)
+    app.before_request(on_request_start); app.after_request(on_response); app.teardown_request(on_request_end)
+    before_render_template.connect(on_before_render_template, app); template_rendered.connect(on_template_rendered, app)
+
+if app.config['METRICS_ENABLED']: setup_metrics()
+
+@app.route('/metrics')
+def metrics():
+    lines = []
+    for metric in [REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_QUERY_TIME, TEMPLATE_RENDER, SLOW_QUERIES]: lines += metric.render()
+    stats = catalog_cache.stats()
+    lines += ['# HELP wasabi_catalog_cache_requests_total 카탈로그 캐시 조회 수', '# TYPE wasabi_catalog_cache_requests_total counter']
+    for namespace, counts in stats['namespaces'].items():
+        lines += [f'wasabi_catalog_cache_requests_total{{namespace="{namespace}",result="hit"}} {counts["hits"]}',
+                  f'wasabi_catalog_cache_requests_total{{namespace="{namespace}",result="miss"}} {counts["misses"]}']
+    lines += ['# HELP wasabi_metrics_enabled 요청 계측 활성화 여부', '# TYPE wasabi_metrics_enabled gauge', f"wasabi_metrics_enabled {int(app.config['METRICS_ENABLED'])}"]
+    lines += ['# HELP wasabi_worker_info 이 응답을 만든 워커 (지표는 워커별 값)', '# TYPE wasabi_worker_info gauge', f'wasabi_worker_info{{pid="{os.getpid()}"}} 1']
+    return app.response_class('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
 # --- DB 초기화 명령어 ---
 @app.cli.command("init-db")
 def init_db_command(): init_db()
 
 # --- Neon DB 깨우기 스케줄러 ---
+# 워커가 여러 개여도 리더 1개만 깨우기 쿼리를 실행 (Postgres advisory lock / SQLite는 파일 잠금)
+# 최근 실제 DB 사용이 있었거나 KEEP_AWAKE_HOURS 밖이면 생략하고, 각 워커는 부팅 시 커넥션 풀을 미리 채움 (gunicorn.conf.py)
+# KEEP_AWAKE_CHECK_SECONDS마다 확인해 마지막 DB 사용(요청 또는 깨우기)부터 KEEP_AWAKE_MINUTES 안에 깨우기 쿼리를 보냄
+# 리더가 아닌 워커는 LEADER_RETRY_MINUTES마다만 리더 자리를 다시 시도 (매 주기 잠금 시도/연결 생성 방지)
+app.config['SCHEDULER_ENABLED'] = os.environ.get('SCHEDULER_ENABLED', '1') == '1'
+app.config['KEEP_AWAKE_MINUTES'] = int(os.environ.get('KEEP_AWAKE_MINUTES', 4)) # Neon 자동 일시정지(5분)보다 짧게
+app.config['KEEP_AWAKE_CHECK_SECONDS'] = int(os.environ.get('KEEP_AWAKE_CHECK_SECONDS', 60))
+app.config['KEEP_AWAKE_HOURS'] = os.environ.get('KEEP_AWAKE_HOURS', '0-24') # 예: '8-23' (서버 시각)
+app.config['DB_WARM_CONNECTIONS'] = int(os.environ.get('DB_WARM_CONNECTIONS', 2))
+app.config['LEADER_RETRY_MINUTES'] = int(os.environ.get('LEADER_RETRY_MINUTES', 15))
+SCHEDULER_LOCK_KEY = 0x57415341 # 'WASA'
+leader_state = {'handle': None, 'retry_at': 0.0}
+db_activity = {'last_checkout': 0.0, 'last_ping': 0.0}
+
+@event.listens_for(Pool, 'checkout')
+def on_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    db_activity['last_checkout'] = time.time()
+
+def acquire_leadership():
+    # 잠금을 쥔 연결/파일을 프로세스가 살아 있는 동안 유지. 프로세스가 죽으면 잠금이 풀려 다른 워커가 이어받음
+    if leader_state['handle'] is not None: return True
+    if time.time() < leader_state['retry_at']: return False
+    if db.engine.dialect.name == 'postgresql':
+        conn = db.engine.connect()
+        if conn.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': SCHEDULER_LOCK_KEY}).scalar(): conn.commit(); leader_state['handle'] = conn
+        else: conn.close()
+    else:
+        try: import fcntl
+        except ImportError: leader_state['handle'] = True; return True
+        lock_file = open(os.path.join(app.config['UPLOAD_FOLDER'], 'wasabi_scheduler.lock'), 'w')
+        try: fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB); leader_state['handle'] = lock_file
+        except OSError: lock_file.close()
+    if leader_state['handle'] is not None: print(f"Scheduler leader: pid {os.getpid()}")
+    else: leader_state['retry_at'] = time.time() + app.config['LEADER_RETRY_MINUTES'] * 60
+    return leader_state['handle'] is not None
+
+def release_leadership():
+    handle = leader_state['handle']; leader_state['handle'] = None
+    try:
+        if hasattr(handle, 'close'): handle.close()
+    except Exception: pass
+
+def within_keep_awake_hours(now=None):
+    start, end = (int(hour) for hour in app.config['KEEP_AWAKE_HOURS'].split('-'))
+    hour = time.localtime(now).tm_hour
+    return start <= hour < end if start <= end else (hour >= start or hour < end)
+
 def keep_db_awake():
     try:
-        with app.app_context(): db.session.execute(text('SELECT 1')); print("Neon DB keep-awake query executed.")
+        with app.app_context():
+            if not within_keep_awake_hours(): return
+            if not acquire_leadership(): return
+            # 다음 확인 때까지 기다리면 KEEP_AWAKE_MINUTES를 넘길 경우에만 깨움
+            idle = time.time() - max(db_activity['last_checkout'], db_activity['last_ping'])
+            if idle + app.config['KEEP_AWAKE_CHECK_SECONDS'] < app.config['KEEP_AWAKE_MINUTES'] * 60: return
+            handle = leader_state['handle']
+            if db.engine.dialect.name == 'postgresql':
+                # 리더 연결로 깨우기 (연결이 끊겼다면 잠금도 풀린 것이므로 리더를 내려놓고 다음 주기에 재선출)
+                try: handle.execute(text('SELECT 1')); handle.commit()
+                except Exception: release_leadership(); raise
+            else: db.session.execute(text('SELECT 1'))
+            db_activity['last_ping'] = time.time(); print("Neon DB keep-awake query executed.")
     except Exception as e: print(f"Error executing keep-awake query: {e}")
-if os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
-    scheduler = BackgroundScheduler(daemon=True); scheduler.add_job(keep_db_awake, 'interval', minutes=4); scheduler.start(); print("APScheduler started.")
+
+def warm_connection_pool():
+    # 워커가 요청을 받기 전에(gunicorn post_worker_init) 연결을 미리 만들어 첫 요청이 TCP/TLS/인증 비용을 치르지 않게 함
+    try:
+        with app.app_context():
+            connections = [db.engine.connect() for _ in range(app.config['DB_WARM_CONNECTIONS'])]
+            for conn in connections: conn.execute(text('SELECT 1')); conn.close()
+        print(f"Warmed {len(connections)} DB connections.")
+    except Exception as e: print(f"Error warming DB connections: {e}")
+
+scheduler_state = {'scheduler': None}; scheduler_lock = threading.Lock()
+
+@app.before_request
+def start_scheduler():
+    # 실제로 요청을 받는 프로세스에서만 시작 (flask init-db, 벤치마크/테스트 임포트, 리로더 감시 프로세스는 제외)
+    if scheduler_state['scheduler'] is not None or not app.config['SCHEDULER_ENABLED'] or app.testing: return
+    with scheduler_lock:
+        if scheduler_state['scheduler'] is not None: return
+        from apscheduler.schedulers.background import BackgroundScheduler
+        scheduler = BackgroundScheduler(daemon=True)
+        scheduler.add_job(keep_db_awake, 'interval', seconds=app.config['KEEP_AWAKE_CHECK_SECONDS'])
+        scheduler.start(); scheduler_state['scheduler'] = scheduler; print("APScheduler started.")
 
 # --- 앱 실행 ---
 if __name__ == '__main__':
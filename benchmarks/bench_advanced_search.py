@@ -0,0 +1,49 @@
+# 상세검색 벤치마크: SQL 경로 vs 컬럼형(pandas/NumPy 마스크) 엔진 결과 일치 확인 및 지연 시간 비교
+# 사용법: python benchmarks/bench_advanced_search.py [SKU 수 ...]
+import sys
+import time
+
+from bench_common import use_temp_database, seed_catalog, mean_ms
+from catalog_generator import generate_rows
+
+use_temp_database('bench_advanced')
+
+from app import app, LIST_ORDER, advanced_search_query, parse_advanced_filters, columnar_search, columnar_snapshot, invalidate_columnar_snapshot
+
+REPEAT = 20
+SCENARIOS = [
+    {'color': 'BK'},
+    {'item_category': '상의', 'size': 'L'},
+    {'min_discount': '30'},
+    {'sale_price_min': '20000', 'sale_price_max': '60000', 'release_year': '2024'},
+    {'product_name': '자켓', 'original_price_min': '50000', 'min_discount': '20'},
+    {'product_number': 'M2', 'color': 'NY', 'size': '30'},
+    {'product_number': '_'}, {'color': 'b_'}, {'product_name': '%'}, # 와일드카드 문자는 글자 그대로 비교
+]
+
+def sql_search(params):
+    query, _ = advanced_search_query(params)
+    return [row.product_number for row in query.order_by(*LIST_ORDER).all()]
+
+def columnar(params):
+    filters, _ = parse_advanced_filters(params)
+    return columnar_search(filters)['product_number'].tolist()
+
+def timed(fn, params):
+    elapsed, results = mean_ms(fn, [params] * REPEAT)
+    return elapsed, results[-1]
+
+def main(sizes):
+    with app.app_context():
+        for n in sizes:
+            seed_catalog(generate_rows(n, seed=n)); invalidate_columnar_snapshot()
+            start = time.perf_counter(); columnar_snapshot(); build_ms = (time.perf_counter() - start) * 1000
+            print(f"\n== {n} SKU (스냅샷 생성 {build_ms:.1f}ms) ==")
+            print(f"{'조건':<60} {'결과':>6} {'SQL(ms)':>9} {'컬럼(ms)':>9} {'배율':>7}")
+            for params in SCENARIOS:
+                sql_ms, sql_result = timed(sql_search, params); col_ms, col_result = timed(columnar, params)
+                assert set(sql_result) == set(col_result), f"결과 불일치: {params}"
+                print(f"{str(params):<60} {len(sql_result):>6} {sql_ms:>9.2f} {col_ms:>9.2f} {sql_ms / col_ms:>6.1f}x")
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
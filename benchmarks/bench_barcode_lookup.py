@@ -0,0 +1,41 @@
+# 바코드 접두 검색 벤치마크: 기존 func.replace 스캔 vs 정규화 키(barcode_key) 인덱스 조회
+# 사용법: python benchmarks/bench_barcode_lookup.py [SKU 수 ...]
+import random
+import sys
+
+from bench_common import use_temp_database, seed_catalog, mean_ms
+from catalog_generator import generate_rows
+
+use_temp_database('bench_barcode')
+
+from sqlalchemy import func
+from app import app, Variant, normalize_key, prefix_filter
+
+LOOKUPS = 200
+
+def seed(n_skus):
+    _, barcodes = seed_catalog(generate_rows(n_skus, seed=n_skus))
+    rng = random.Random(n_skus)
+    return [normalize_key(barcode)[:12] for barcode in rng.sample(barcodes, min(LOOKUPS, len(barcodes)))]
+
+def timed(fn, scans):
+    elapsed, results = mean_ms(fn, scans)
+    assert all(result is not None for result in results)
+    return elapsed
+
+def legacy_lookup(scanned):
+    return Variant.query.filter( func.replace(Variant.barcode, '-', '').startswith(scanned) ).first()
+
+def indexed_lookup(scanned):
+    return Variant.query.filter( prefix_filter(Variant.barcode_key, scanned) ).first()
+
+def main(sizes):
+    print(f"{'SKU':>10} {'기존(ms)':>10} {'인덱스(ms)':>10} {'배율':>8}")
+    with app.app_context():
+        for n in sizes:
+            scans = seed(n)
+            legacy = timed(legacy_lookup, scans); indexed = timed(indexed_lookup, scans)
+            print(f"{n:>10} {legacy:>10.3f} {indexed:>10.3f} {legacy / indexed:>7.1f}x")
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000])
@@ -0,0 +1,44 @@
+# 벤치마크 공용 헬퍼: 임시 SQLite 앱 환경, 합성 카탈로그 적재(catalog_generator 행 형식), 평균 지연 측정
+# 사용법: use_temp_database('이름')을 app 임포트 전에 호출한 뒤 app_context 안에서 seed_catalog(generate_rows(n)) / mean_ms(fn, inputs)
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from catalog_generator import CATALOG_COLS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def use_temp_database(name):
+    # 임시 SQLite + 스케줄러/요청 지표 끔 (대량 적재 쿼리가 [SLOW QUERY]로 출력되지 않게)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), f'{name}.db')
+    os.environ['SCHEDULER_ENABLED'] = '0'; os.environ['METRICS_ENABLED'] = '0'
+    sys.path.insert(0, ROOT)
+
+def seed_catalog(rows):
+    # CATALOG_COLS 순서 행을 값 그대로 bulk insert (파생 컬럼은 앱 함수로 계산) 후 요약/관련 상품/캐시 갱신 -> (품번 목록, 바코드 목록)
+    import app as wasabi
+    wasabi.db.drop_all()
+    with contextlib.redirect_stdout(io.StringIO()): wasabi.init_db() # 초기화 로그가 결과 표에 섞이지 않게
+    products = {}; variants = []
+    for row in rows:
+        record = dict(zip(CATALOG_COLS, row)); product_number = record['product_number']
+        if product_number not in products:
+            products[product_number] = {'product_number': product_number, 'product_number_key': wasabi.normalize_key(product_number), 'product_name': record['product_name'],
+                                        'release_year': record['release_year'] or None, 'item_category': record['item_category'], 'is_favorite': record['is_favorite']}
+        variants.append({'barcode': record['barcode'], 'barcode_key': wasabi.normalize_key(record['barcode']), 'product_number': product_number,
+                         'color': record['color'], 'size': record['size'], 'size_rank': wasabi.size_rank(record['size']), 'size_key': wasabi.size_key(record['size']),
+                         **{col: record[col] for col in ['store_stock', 'hq_stock', 'original_price', 'sale_price']}})
+    wasabi.db.session.bulk_insert_mappings(wasabi.Product, list(products.values())); wasabi.db.session.bulk_insert_mappings(wasabi.Variant, variants)
+    wasabi.refresh_product_summaries(); wasabi.db.session.commit()
+    wasabi.invalidate_search_index(); wasabi.invalidate_columnar_snapshot(); wasabi.catalog_cache.invalidate_all()
+    wasabi.refresh_related_products()
+    return list(products), [variant['barcode'] for variant in variants]
+
+def mean_ms(fn, inputs):
+    # inputs 각각에 fn 호출 -> (호출당 평균 ms, 결과 리스트)
+    results = []; start = time.perf_counter()
+    for value in inputs: results.append(fn(value))
+    return (time.perf_counter() - start) / len(results) * 1000, results
@@ -0,0 +1,68 @@
+# 상품 상세 로딩 벤치마크: 기존(ORM 로드 + get_sort_key 파이썬 정렬 + 관련 상품 실시간 검색) vs 미리 계산한 size_rank/size_key/관련 상품 단일 쿼리
+# 사용법: python benchmarks/bench_product_detail.py [컬러 수 ...]  (상품당 SKU = 컬러 수 x 사이즈 수)
+import random
+import sys
+
+from bench_common import use_temp_database, seed_catalog, mean_ms
+
+use_temp_database('bench_detail')
+
+from app import app, db, Product, search_product_numbers, products_in_order, load_product_detail, model_dict, PRODUCT_FIELDS, VARIANT_FIELDS
+
+N_PRODUCTS = 500
+LOOKUPS = 300
+SIZES = ['XXS', 'XS', 'S', 'M', 'L', 'XL', '2XL', '3XL', '85', '90', '95', '100', '105', '110', 'FREE', 'OS', 'one', ' Kids ', 'f', 'xxxs'] # 소문자/공백 포함 기타 사이즈
+
+def catalog_rows(n_colors, rng):
+    # 상품마다 컬러 n_colors x SIZES 전체 (catalog_generator 행 형식, 사이즈 값은 공백/소문자 그대로)
+    for i in range(N_PRODUCTS):
+        product_name = f'상품 {i} {rng.choice(["자켓", "티셔츠", "팬츠", "니트"])}{i % 40}'
+        combos = [(f'C{color:02d}', size) for color in range(n_colors) for size in SIZES]; rng.shuffle(combos) # 삽입 순서를 섞어 정렬 비용 반영
+        for color, size in combos:
+            yield [f'M{i:06d}', product_name, color, f'88{i:06d}{color}{size}', size, None, '', 50000, 39000, rng.randrange(5), rng.randrange(20), 0]
+
+def seed(n_colors):
+    rng = random.Random(n_colors)
+    seed_catalog(catalog_rows(n_colors, rng))
+    return [f'M{rng.randrange(N_PRODUCTS):06d}' for _ in range(LOOKUPS)]
+
+def legacy_sort_key(variant):
+    color = variant.color or ''; size_str = str(variant.size).upper().strip()
+    if size_str == '2XS': size_str = 'XXS'
+    elif size_str == '2XL': size_str = 'XXL'
+    elif size_str == '3XL': size_str = 'XXXL'
+    custom_order = ['XXS', 'XS', 'S', 'M', 'L', 'XL', 'XXL', 'XXXL']
+    if size_str.isdigit(): sort_key = (1, int(size_str), '')
+    elif size_str in custom_order: sort_key = (2, custom_order.index(size_str), '')
+    else: sort_key = (3, 0, size_str)
+    return (color, sort_key)
+
+def legacy_detail(product_number):
+    product = db.session.get(Product, product_number)
+    related_products = []
+    search_term = product.product_name.split(' ')[-1]
+    if len(search_term) > 1: related_products = products_in_order(search_product_numbers(search_term, fields=('name',), limit=5, exclude=product_number))
+    return {'product': model_dict(product, PRODUCT_FIELDS),
+            'variants': [model_dict(variant, VARIANT_FIELDS) for variant in sorted(product.variants, key=legacy_sort_key)],
+            'related_products': [model_dict(related, ['product_number', 'product_name']) for related in related_products]}
+
+def timed(fn, lookups):
+    def request(product_number):
+        result = fn(product_number); db.session.expunge_all() # 매 요청 새 세션과 동일하게
+        return result
+    return mean_ms(request, lookups)[0]
+
+def main(color_counts):
+    print(f"{'SKU/상품':>10} {'기존(ms)':>10} {'사전계산(ms)':>12} {'배율':>8}")
+    with app.app_context():
+        for n_colors in color_counts:
+            lookups = seed(n_colors)
+            for product_number in lookups[:20]:
+                legacy, precomputed = legacy_detail(product_number), load_product_detail(product_number)
+                assert [(v['color'], v['size']) for v in legacy['variants']] == [(v['color'], v['size']) for v in precomputed['variants']]
+                assert legacy['related_products'] == precomputed['related_products']
+            legacy = timed(legacy_detail, lookups); precomputed = timed(load_product_detail, lookups)
+            print(f"{n_colors * len(SIZES):>10} {legacy:>10.3f} {precomputed:>12.3f} {legacy / precomputed:>7.1f}x")
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [2, 8, 20])
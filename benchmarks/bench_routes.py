@@ -0,0 +1,324 @@
+# 라우트 회귀 벤치마크: 합성 카탈로그를 import_excel로 적재한 뒤 주요 라우트의 지연 분위수/최대 메모리를 JSON 기준선으로 저장하고 커밋 간 비교
+# 사용법:
+#   python benchmarks/bench_routes.py --skus 10000 --output baseline.json
+#   python benchmarks/bench_routes.py --skus 10000 --compare baseline.json --output current.json   (회귀가 있으면 종료 코드 1)
+# 백엔드: SQLite(임시 파일, 오프라인)는 항상 측정. BENCH_POSTGRES_URL(기본 postgresql+psycopg2://localhost/wasabi_bench)에 연결되면 Postgres도 측정
+#         (주의: 해당 DB의 테이블을 지우고 다시 만듦)
+# 모드: client = Flask 테스트 클라이언트(프로세스 내) / http = 별도 프로세스의 스레드 서버에 동시 HTTP 요청. OCR은 stub 백엔드 사용
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from catalog_generator import CATALOG_COLS, write_catalog
+
+DEFAULT_POSTGRES_URL = 'postgresql+psycopg2://localhost/wasabi_bench'
+HTTP_SCENARIOS = ['index', 'index_search', 'advanced_search', 'product_detail', 'barcode_search', 'text_search', 'update_stock', 'ocr_upload']
+CLIENT_SCENARIOS = HTTP_SCENARIOS + ['import_excel']
+ADVANCED_PARAMS = [{'color': 'BK'}, {'item_category': '상의', 'size': 'L'}, {'min_discount': '30'},
+                   {'sale_price_min': '20000', 'sale_price_max': '60000', 'release_year': '2024'}, {'product_name': '자켓', 'min_discount': '20'}]
+SEARCH_TERMS = ['티셔츠', '자켓', '코튼 팬츠', '니트', '스니커즈']
+COMPARE_METRICS = ['p50_ms', 'p95_ms']
+
+# --- 결과 집계 ---
+def summarize(latencies, errors, elapsed=None):
+    values = sorted(latencies)
+    percentile = lambda p: round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 3) if values else 0.0
+    summary = {'count': len(values), 'errors': errors, 'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+               'p50_ms': percentile(0.5), 'p90_ms': percentile(0.9), 'p95_ms': percentile(0.95), 'p99_ms': percentile(0.99), 'max_ms': percentile(1.0)}
+    if elapsed: summary['rps'] = round(len(values) / elapsed, 1)
+    return summary
+
+def peak_rss_kb(pid=None):
+    # 프로세스 최대 RSS (리눅스 /proc VmHWM, 없으면 getrusage)
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as status:
+            for line in status:
+                if line.startswith('VmHWM:'): return int(line.split()[1])
+    except OSError: pass
+    if pid is None:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None
+
+# --- 요청 시나리오 ---
+def random_image(rng):
+    # 매번 다른 이미지 (OCR 결과 캐시를 우회해 전처리/파이프라인 비용을 측정)
+    from PIL import Image
+    image = Image.new('RGB', (1200, 900), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    output = io.BytesIO(); image.save(output, format='JPEG'); return output.getvalue()
+
+def scenario_requests(name, catalog, rng):
+    # 시나리오별 요청 생성기: {'method', 'path', 'json' | 'files'+'form'}
+    products, barcodes = catalog['products'], catalog['barcodes']
+    if name == 'index': return lambda: {'method': 'GET', 'path': '/'}
+    if name == 'index_search': return lambda: {'method': 'GET', 'path': '/?' + urlencode({'query': rng.choice(SEARCH_TERMS + [p[:6] for p in products[:20]])})}
+    if name == 'advanced_search': return lambda: {'method': 'GET', 'path': '/advanced_search?' + urlencode(rng.choice(ADVANCED_PARAMS))}
+    if name == 'product_detail': return lambda: {'method': 'GET', 'path': f'/product/{rng.choice(products)}'}
+    if name == 'barcode_search': return lambda: {'method': 'POST', 'path': '/barcode_search', 'json': {'barcode': rng.choice(barcodes)[:12]}}
+    if name == 'text_search': return lambda: {'method': 'POST', 'path': '/text_search', 'json': {'text': rng.choice([rng.choice(products), rng.choice(SEARCH_TERMS)])}}
+    if name == 'update_stock':
+        signs = {} # 같은 바코드는 +1/-1을 번갈아 재고가 바닥나지 않게 유지
+        def update_stock():
+            barcode = rng.choice(barcodes[:200]); signs[barcode] = -signs.get(barcode, -1)
+            return {'method': 'POST', 'path': '/update_stock', 'json': {'barcode': barcode, 'change': signs[barcode]}}
+        return update_stock
+    if name == 'ocr_upload': return lambda: {'method': 'POST', 'path': '/ocr_upload', 'files': {'ocr_image': (random_image(rng), 'scan.jpg')}, 'form': {}}
+    if name == 'import_excel':
+        with open(catalog['path'], 'rb') as source: content = source.read()
+        return lambda: {'method': 'POST', 'path': '/import_excel', 'files': {'excel_file': (content, os.path.basename(catalog['path']))}, 'form': {'import_mode': catalog['import_mode']}}
+    raise ValueError(name)
+
+def is_error(status):
+    return status >= 500
+
+# --- 워커: 실제 측정 (DATABASE_URL을 정한 뒤 app 임포트) ---
+def load_app(database_url, cache_ttl):
+    os.environ['DATABASE_URL'] = database_url; os.environ['SCHEDULER_ENABLED'] = '0'; os.environ['CATALOG_CACHE_TTL'] = str(cache_ttl)
+    os.environ.setdefault('METRICS_ENABLED', '0'); os.environ['OCR_BACKEND'] = 'stub' # google-cloud-vision/네트워크 없이 전처리+파이프라인만 측정
+    os.environ['IMPORT_MAX_CONTENT_LENGTH'] = str(4 * 1024 ** 3) # 100만 SKU 카탈로그도 413 없이 업로드
+    sys.path.insert(0, ROOT)
+    import app as wasabi
+    wasabi.app.testing = True
+    return wasabi
+
+def stub_ocr_text(products):
+    # stub OCR 인식 결과는 OCR 품번 패턴(M으로 시작)에 맞는 실제 품번
+    os.environ['OCR_STUB_TEXT'] = next((p for p in products if p.startswith('M')), products[0] if products else '')
+
+def log(message):
+    print(message, file=sys.__stdout__, flush=True)
+
+def client_call(client, spec):
+    if 'files' in spec:
+        data = {**spec['form'], **{field: (io.BytesIO(content), filename) for field, (content, filename) in spec['files'].items()}}
+        return client.open(spec['path'], method=spec['method'], data=data, content_type='multipart/form-data').status_code
+    return client.open(spec['path'], method=spec['method'], json=spec.get('json')).status_code
+
+def run_client_scenario(client, make_request, n_requests, warmup, memory_samples):
+    for _ in range(warmup): client_call(client, make_request())
+    latencies = []; errors = 0
+    for _ in range(n_requests):
+        spec = make_request(); start = time.perf_counter(); status = client_call(client, spec); latencies.append(time.perf_counter() - start)
+        errors += is_error(status)
+    # 메모리는 tracemalloc 오버헤드가 지연 측정에 섞이지 않도록 별도 패스로 측정
+    tracemalloc.start()
+    for _ in range(memory_samples): client_call(client, make_request())
+    peak = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+    return {**summarize(latencies, errors), 'peak_alloc_kb': round(peak / 1024, 1)}
+
+def load_catalog(wasabi, args, workdir):
+    path = write_catalog(os.path.join(workdir, f'catalog_{args.skus}.{args.format}'), args.skus, args.seed)
+    assert CATALOG_COLS == wasabi.EXPORT_COLS, '생성기 컬럼이 import_excel 스키마와 다름'
+    with wasabi.app.app_context(): wasabi.db.drop_all()
+    wasabi.init_db()
+    client = wasabi.app.test_client()
+    with open(path, 'rb') as source:
+        start = time.perf_counter()
+        response = client.post('/import_excel', data={'excel_file': (source, os.path.basename(path)), 'import_mode': args.import_mode}, content_type='multipart/form-data', follow_redirects=True)
+        load_seconds = time.perf_counter() - start
+    assert response.status_code == 200 and 'class="flash success"' in response.get_data(as_text=True), '카탈로그 적재 실패'
+    with wasabi.app.app_context():
+        products = [row[0] for row in wasabi.db.session.execute(wasabi.db.select(wasabi.Product.product_number).order_by(wasabi.Product.product_number))]
+        barcodes = [row[0] for row in wasabi.db.session.execute(wasabi.db.select(wasabi.Variant.barcode).order_by(wasabi.Variant.barcode))]
+    return {'path': path, 'import_mode': args.import_mode, 'products': products, 'barcodes': barcodes, 'load_seconds': round(load_seconds, 3)}
+
+def run_worker(args):
+    wasabi = load_app(args.database_url, args.cache_ttl)
+    workdir = tempfile.mkdtemp(prefix='bench_routes_')
+    with contextlib.redirect_stdout(io.StringIO()): catalog = load_catalog(wasabi, args, workdir)
+    stub_ocr_text(catalog['products'])
+    with wasabi.app.app_context(): dialect = wasabi.db.engine.dialect.name
+    result = {'dialect': dialect, 'products': len(catalog['products']), 'skus': len(catalog['barcodes']), 'initial_import_s': catalog['load_seconds'], 'modes': {}}
+    log(f"[{dialect}] 카탈로그 적재: 상품 {result['products']} / SKU {result['skus']} ({catalog['load_seconds']:.1f}s)")
+
+    if 'client' in args.modes:
+        client = wasabi.app.test_client(); scenarios = {}
+        for name in CLIENT_SCENARIOS:
+            if args.scenarios and name not in args.scenarios: continue
+            heavy = name == 'import_excel'
+            make_request = scenario_requests(name, catalog, random.Random(f'{args.seed}:{name}'))
+            with contextlib.redirect_stdout(io.StringIO()): # 앱의 print 로그가 결과 출력에 섞이지 않게
+                scenarios[name] = run_client_scenario(client, make_request, args.import_repeats if heavy else args.requests, 0 if heavy else args.warmup, 1 if heavy else args.memory_samples)
+            log(f"[{dialect}/client] {name:<16} p50 {scenarios[name]['p50_ms']:>9.2f}ms  p95 {scenarios[name]['p95_ms']:>9.2f}ms  peak {scenarios[name]['peak_alloc_kb']:>9.1f}KiB  errors {scenarios[name]['errors']}")
+        result['modes']['client'] = {'scenarios': scenarios, 'peak_rss_kb': peak_rss_kb()}
+
+    if 'http' in args.modes:
+        result['modes']['http'] = run_http(args, catalog)
+    return result
+
+# --- HTTP 동시 요청 ---
+def encode_multipart(form, files):
+    boundary = uuid.uuid4().hex; body = io.BytesIO()
+    for field, value in form.items(): body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+    for field, (content, filename) in files.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode('utf-8'))
+        body.write(content); body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode('utf-8'))
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+def http_call(conn, spec):
+    if 'files' in spec: body, content_type = encode_multipart(spec['form'], spec['files'])
+    elif 'json' in spec: body, content_type = json.dumps(spec['json']).encode('utf-8'), 'application/json'
+    else: body, content_type = None, None
+    conn.request(spec['method'], spec['path'], body=body, headers={'Content-Type': content_type} if content_type else {})
+    response = conn.getresponse(); response.read()
+    return response.status
+
+def start_server(args, port):
+    command = [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port), '--database-url', args.database_url, '--cache-ttl', str(args.cache_ttl)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2); conn.request('GET', '/direct_search'); conn.getresponse().read(); conn.close()
+            return process
+        except OSError: time.sleep(0.1)
+    process.terminate(); raise RuntimeError('벤치마크 서버 시작 실패')
+
+def run_http_scenario(port, make_request, n_requests, concurrency):
+    # 요청 생성은 시드 고정을 위해 미리 만들어 두고 클라이언트 스레드가 나눠 처리
+    specs = [make_request() for _ in range(n_requests)]; cursor = iter(specs)
+    latencies = []; errors = [0]; lock = threading.Lock()
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60); local = []; local_errors = 0
+        while True:
+            with lock: spec = next(cursor, None)
+            if spec is None: break
+            start = time.perf_counter()
+            try: local_errors += is_error(http_call(conn, spec))
+            except (OSError, http.client.HTTPException):
+                local_errors += 1; conn.close(); conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock: latencies.extend(local); errors[0] += local_errors
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - start)
+
+def run_http(args, catalog):
+    port = args.port; process = start_server(args, port); scenarios = {}
+    try:
+        for name in HTTP_SCENARIOS:
+            if args.scenarios and name not in args.scenarios: continue
+            make_request = scenario_requests(name, catalog, random.Random(f'{args.seed}:http:{name}'))
+            run_http_scenario(port, make_request, args.warmup, 1)
+            scenarios[name] = run_http_scenario(port, make_request, args.requests, args.concurrency)
+            log(f"[http x{args.concurrency}] {name:<16} p50 {scenarios[name]['p50_ms']:>9.2f}ms  p95 {scenarios[name]['p95_ms']:>9.2f}ms  {scenarios[name]['rps']:>8.1f} req/s  errors {scenarios[name]['errors']}")
+        server_rss = peak_rss_kb(process.pid)
+    finally: process.terminate(); process.wait()
+    return {'concurrency': args.concurrency, 'scenarios': scenarios, 'server_peak_rss_kb': server_rss}
+
+def run_server(args):
+    # --serve: 측정 대상 서버 프로세스 (스레드 처리, stub OCR)
+    wasabi = load_app(args.database_url, args.cache_ttl); wasabi.app.testing = False
+    with wasabi.app.app_context(): products = wasabi.db.session.execute(wasabi.db.select(wasabi.Product.product_number).order_by(wasabi.Product.product_number)).scalars().all()
+    stub_ocr_text(products)
+    import logging
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    wasabi.app.run(host='127.0.0.1', port=args.port, threaded=True, debug=False, use_reloader=False)
+
+# --- 기준선 저장/비교 ---
+def postgres_url(args):
+    url = args.postgres_url or os.environ.get('BENCH_POSTGRES_URL', DEFAULT_POSTGRES_URL)
+    try:
+        from sqlalchemy import create_engine, text
+        engine = create_engine(url, connect_args={'connect_timeout': 3})
+        with engine.connect() as conn: conn.execute(text('SELECT 1'))
+        engine.dispose(); return url
+    except Exception as e: print(f"Postgres 건너뜀 ({url}): {type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"); return None
+
+def git_revision():
+    try: return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError): return None
+
+def compare(baseline, current, threshold, min_delta_ms):
+    # 기준선 대비 p50/p95가 threshold 비율 이상 + min_delta_ms 이상 느려지거나, 오류 수가 늘면 회귀 (실패 응답이 빨라 보이는 것 방지)
+    regressions = []
+    print(f"\n{'backend/mode/scenario':<40} {'지표':>7} {'기준(ms)':>10} {'현재(ms)':>10} {'변화':>8}")
+    for backend, result in current['backends'].items():
+        for mode, mode_result in result['modes'].items():
+            for name, summary in mode_result['scenarios'].items():
+                old = baseline.get('backends', {}).get(backend, {}).get('modes', {}).get(mode, {}).get('scenarios', {}).get(name)
+                if not old: continue
+                if summary['errors'] > old['errors']:
+                    regressions.append(f'{backend}/{mode}/{name} errors')
+                    print(f"{backend + '/' + mode + '/' + name:<40} {'errors':>7} {old['errors']:>10} {summary['errors']:>10} {'':>8} !")
+                for metric in COMPARE_METRICS:
+                    before, after = old[metric], summary[metric]
+                    change = (after - before) / before if before else 0.0
+                    regressed = change > threshold and after - before > min_delta_ms
+                    if regressed: regressions.append(f'{backend}/{mode}/{name} {metric}')
+                    print(f"{backend + '/' + mode + '/' + name:<40} {metric[:3]:>7} {before:>10.2f} {after:>10.2f} {change:>+7.0%}{' !' if regressed else ''}")
+    print(f"\n회귀 {len(regressions)}건" + (f": {', '.join(regressions)}" if regressions else ''))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='라우트 지연/메모리 회귀 벤치마크')
+    parser.add_argument('--skus', type=int, default=10000, help='합성 카탈로그 SKU 수 (1만~100만)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=['xlsx', 'csv'], default='xlsx', help='카탈로그 파일 형식 (대용량은 csv 권장)')
+    parser.add_argument('--import-mode', choices=['replace', 'stream', 'delta'], default='stream')
+    parser.add_argument('--import-repeats', type=int, default=3, help='import_excel 재적재 측정 횟수')
+    parser.add_argument('--requests', type=int, default=200, help='시나리오당 요청 수')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--memory-samples', type=int, default=20, help='tracemalloc 측정 요청 수')
+    parser.add_argument('--concurrency', type=int, default=8, help='http 모드 동시 클라이언트 수')
+    parser.add_argument('--modes', nargs='+', choices=['client', 'http'], default=['client', 'http'])
+    parser.add_argument('--scenarios', nargs='+', choices=CLIENT_SCENARIOS)
+    parser.add_argument('--backends', nargs='+', choices=['sqlite', 'postgresql'], help='기본: sqlite + (연결되면) postgresql')
+    parser.add_argument('--postgres-url', help=f'기본: BENCH_POSTGRES_URL 또는 {DEFAULT_POSTGRES_URL}')
+    parser.add_argument('--cache-ttl', type=int, default=0, help='CATALOG_CACHE_TTL (기본 0: DB 경로 측정)')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--output', help='결과 JSON 경로')
+    parser.add_argument('--compare', help='비교할 기준선 JSON 경로')
+    parser.add_argument('--threshold', type=float, default=0.15, help='회귀 판정 비율 (기본 15%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='회귀 판정 최소 차이(ms)')
+    parser.add_argument('--database-url', help=argparse.SUPPRESS)
+    parser.add_argument('--worker', help=argparse.SUPPRESS) # 결과 JSON 경로
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve: return run_server(args)
+    if args.worker:
+        with open(args.worker, 'w') as output: json.dump(run_worker(args), output)
+        return
+
+    # 백엔드마다 DATABASE_URL이 다른 새 프로세스에서 측정 (app은 임포트 시점에 DB를 정함)
+    backends = {}
+    for backend in args.backends or ['sqlite', 'postgresql']:
+        url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_routes.db') if backend == 'sqlite' else postgres_url(args)
+        if url is None: continue
+        result_path = os.path.join(tempfile.mkdtemp(), 'result.json')
+        subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--worker', result_path, '--database-url', url], check=True)
+        with open(result_path) as source: backends[backend] = json.load(source)
+    report = {'meta': {'git_revision': git_revision(), 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'python': platform.python_version(),
+                       'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                       'params': {key: getattr(args, key) for key in ['skus', 'seed', 'format', 'import_mode', 'import_repeats', 'requests', 'concurrency', 'cache_ttl']}},
+              'backends': backends}
+    if args.output:
+        with open(args.output, 'w') as output: json.dump(report, output, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.output}")
+    if args.compare:
+        with open(args.compare) as source: baseline = json.load(source)
+        if baseline.get('meta', {}).get('params') != report['meta']['params']: print(f"주의: 기준선과 측정 조건이 다름 ({baseline.get('meta', {}).get('params')})")
+        if compare(baseline, report, args.threshold, args.min_delta_ms): sys.exit(1)
+
+if __name__ == '__main__':
+    main()
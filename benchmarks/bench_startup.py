@@ -0,0 +1,76 @@
+# 콜드 스타트 벤치마크: app 임포트 시간, 첫 응답까지 시간(테스트 클라이언트 / 실제 HTTP 서버), 첫 응답 시점에 로드된 무거운 모듈
+# 사용법: python benchmarks/bench_startup.py [반복 횟수]
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['pandas', 'numpy', 'google.cloud.vision', 'grpc', 'apscheduler', 'PIL']
+
+# 새 인터프리터에서 실행: 임포트 시간과 index 첫 응답 시간을 측정
+IN_PROCESS_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app as wasabi
+imported = time.perf_counter()
+response = wasabi.app.test_client().get('/')
+responded = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({{'import_ms': (imported - start) * 1000, 'first_response_ms': (responded - start) * 1000,
+                  'heavy_modules': [name for name in {heavy!r} if name in sys.modules]}}))
+'''
+
+SERVER_SCRIPT = '''
+import sys
+sys.path.insert(0, {root!r})
+from app import app
+app.run(host='127.0.0.1', port={port}, debug=False, use_reloader=False)
+'''
+
+def create_db(env):
+    # 빈 스키마만 미리 만들어 둠 (측정 대상 아님)
+    subprocess.run([sys.executable, '-c', f'import sys; sys.path.insert(0, {ROOT!r}); import app; app.init_db()'], env=env, check=True, capture_output=True)
+
+def in_process_run(env):
+    result = subprocess.run([sys.executable, '-c', IN_PROCESS_SCRIPT.format(root=ROOT, heavy=HEAVY_MODULES)], env=env, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def free_port():
+    with socket.socket() as sock: sock.bind(('127.0.0.1', 0)); return sock.getsockname()[1]
+
+def http_run(env, timeout=30):
+    # 프로세스 생성부터 실제 HTTP 200 응답까지 (인터프리터 기동 포함)
+    port = free_port(); start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-c', SERVER_SCRIPT.format(root=ROOT, port=port)], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as response:
+                    if response.status == 200: return (time.perf_counter() - start) * 1000
+            except OSError: time.sleep(0.01)
+        raise RuntimeError('서버 응답 없음')
+    finally: server.terminate(); server.wait()
+
+def summary(values):
+    return f"{statistics.median(values):>9.1f} {min(values):>9.1f} {max(values):>9.1f}"
+
+def main(runs):
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_startup.db'), PYTHONDONTWRITEBYTECODE='1')
+    create_db(env)
+    results = [in_process_run(env) for _ in range(runs)]
+    http_times = [http_run(env) for _ in range(runs)]
+    print(f"{'항목(ms)':<22} {'중앙값':>9} {'최소':>9} {'최대':>9}")
+    print(f"{'app 임포트':<22} {summary([r['import_ms'] for r in results])}")
+    print(f"{'첫 응답 (test client)':<22} {summary([r['first_response_ms'] for r in results])}")
+    print(f"{'첫 응답 (HTTP, 기동 포함)':<22} {summary(http_times)}")
+    print(f"첫 응답까지 로드된 무거운 모듈: {results[-1]['heavy_modules'] or '없음'}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,62 @@
+# 합성 카탈로그 생성기: import_excel이 받는 엑셀 스키마 그대로 (시드 고정 -> 같은 입력이면 같은 파일)
+# 사용법: python benchmarks/catalog_generator.py <SKU 수> <출력 파일(.xlsx|.csv)> [--seed N]
+# 행을 스트리밍으로 써서 100만 SKU도 메모리 사용량이 일정 (xlsx는 openpyxl write-only 모드)
+import argparse
+import csv
+import random
+
+CATALOG_COLS = ['product_number', 'product_name', 'color', 'barcode', 'size', 'release_year', 'item_category',
+                'original_price', 'sale_price', 'store_stock', 'hq_stock', 'is_favorite']
+CATEGORIES = ['상의', '하의', '아우터', '원피스', '신발', '가방', '모자', '액세서리']
+GENDERS = ['남성', '여성', '공용', '키즈']
+ITEMS = {'상의': ['티셔츠', '셔츠', '니트', '맨투맨', '후드'], '하의': ['팬츠', '청바지', '슬랙스', '스커트', '쇼츠'], '아우터': ['자켓', '코트', '패딩', '점퍼', '가디건'],
+         '원피스': ['원피스', '점프수트'], '신발': ['스니커즈', '로퍼', '샌들', '부츠'], '가방': ['백팩', '토트백', '크로스백'], '모자': ['볼캡', '버킷햇', '비니'], '액세서리': ['벨트', '머플러', '양말']}
+SIZE_SETS = {'상의': ['XS', 'S', 'M', 'L', 'XL', '2XL'], '하의': ['26', '28', '30', '32', '34', '36'], '아우터': ['S', 'M', 'L', 'XL', '2XL', '3XL'],
+             '원피스': ['XS', 'S', 'M', 'L'], '신발': ['230', '240', '250', '260', '270', '280'], '가방': ['FREE'], '모자': ['FREE', 'M', 'L'], '액세서리': ['FREE', 'OS']}
+COLORS = ['BK', 'WH', 'NY', 'GY', 'BE', 'RD', 'KH', 'BL', 'CR', 'BR', 'PK', 'GN']
+MATERIALS = ['코튼', '린넨', '울', '데님', '나일론', '레더', '플리스', '스트레치']
+DISCOUNTS = [0, 0, 0, 10, 20, 30, 40, 50, 70]
+FAVORITE_RATIO = 0.02
+
+def generate_rows(n_skus, seed=0):
+    # CATALOG_COLS 순서의 행 리스트를 정확히 n_skus개 생성 (상품당 컬러 1~5 x 사이즈 세트)
+    rng = random.Random(seed); sku = 0; index = 0
+    while sku < n_skus:
+        category = rng.choice(CATEGORIES); item = rng.choice(ITEMS[category])
+        product_number = f"{rng.choice('MWUK')}{rng.randrange(19, 26)}{category_code(category)}{index:06d}-{rng.randrange(1, 10):02d}"
+        product_name = f"{rng.choice(GENDERS)} {rng.choice(MATERIALS)} {item}"
+        release_year = rng.randrange(2019, 2026); is_favorite = int(rng.random() < FAVORITE_RATIO)
+        original_price = rng.randrange(10, 300) * 1000
+        sizes = SIZE_SETS[category]; sizes = sizes[rng.randrange(0, max(1, len(sizes) - 3)):] if len(sizes) > 3 else sizes
+        for color in rng.sample(COLORS, rng.randint(1, 5)):
+            sale_price = original_price * (100 - rng.choice(DISCOUNTS)) // 10000 * 100 # 컬러별 할인율, 100원 단위
+            for size in sizes:
+                if sku >= n_skus: return
+                yield [product_number, product_name, color, f'880{sku:010d}', size, release_year, category,
+                       original_price, sale_price, rng.randrange(0, 6), rng.randrange(0, 40), is_favorite]
+                sku += 1
+        index += 1
+
+def category_code(category):
+    return f'{CATEGORIES.index(category):02d}'
+
+def write_catalog(path, n_skus, seed=0):
+    rows = generate_rows(n_skus, seed)
+    if path.endswith('.csv'):
+        with open(path, 'w', encoding='utf-8-sig', newline='') as output:
+            writer = csv.writer(output); writer.writerow(CATALOG_COLS); writer.writerows(rows)
+        return path
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True); sheet = workbook.create_sheet('catalog')
+    sheet.append(CATALOG_COLS)
+    for row in rows: sheet.append(row)
+    workbook.save(path)
+    return path
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='합성 카탈로그 엑셀/CSV 생성')
+    parser.add_argument('skus', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(f"{write_catalog(args.path, args.skus, args.seed)}: {args.skus} SKU (seed {args.seed})")
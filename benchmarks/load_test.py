@@ -0,0 +1,102 @@
+# 로컬 부하 테스트: gunicorn 워커 수별 처리량(req/s)과 지연 분위수 비교
+# 사용법: python benchmarks/load_test.py --workers 1 2 4 --threads 4 --concurrency 16 --duration 10
+# DATABASE_URL을 지정하지 않으면 임시 SQLite 사용. SKU가 --skus보다 적으면 합성 카탈로그로 다시 채움 (주의: 해당 DB의 테이블을 지우고 다시 만듦)
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'load_test.db'))
+os.environ['SCHEDULER_ENABLED'] = '0'; os.environ.setdefault('METRICS_ENABLED', '0')
+
+from bench_common import ROOT, seed_catalog
+from catalog_generator import generate_rows
+
+sys.path.insert(0, ROOT)
+from app import app, db, init_db, Product, Variant
+
+def seed(n_skus):
+    # 이미 충분한 카탈로그가 있으면 그대로 사용, 아니면 seed_catalog로 다시 적재 (요약/관련 상품/캐시까지 재구성)
+    init_db()
+    with app.app_context():
+        if db.session.query(Variant).count() < n_skus: seed_catalog(generate_rows(n_skus))
+        products = db.session.execute(db.select(Product.product_number).order_by(Product.product_number).limit(1000)).scalars().all()
+        barcodes = db.session.execute(db.select(Variant.barcode).order_by(Variant.barcode).limit(1000)).scalars().all()
+    return products, barcodes
+
+def scenarios(product_numbers, barcodes):
+    rng = random.Random(0)
+    def pick():
+        choice = rng.random()
+        if choice < 0.4: return 'GET', f'/product/{rng.choice(product_numbers)}', None
+        if choice < 0.55: return 'GET', '/', None
+        if choice < 0.7: return 'GET', f'/?query={quote(rng.choice(["M2", "자켓", "티셔츠"]))}', None
+        if choice < 0.8: return 'GET', '/advanced_search?color=BK&min_discount=20', None
+        if choice < 0.9: return 'GET', '/all_products', None
+        return 'POST', '/barcode_search', json.dumps({'barcode': rng.choice(barcodes)})
+    return pick
+
+def start_server(workers, threads, port, env):
+    command = [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads), '--worker-class', 'gthread',
+               '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2); conn.request('GET', '/direct_search'); conn.getresponse().read(); conn.close()
+            return process
+        except OSError: time.sleep(0.2)
+    process.terminate(); raise RuntimeError('gunicorn 시작 실패')
+
+def run_load(port, pick, concurrency, duration):
+    latencies = []; errors = [0]; lock = threading.Lock(); stop_at = time.time() + duration
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30); local = []; local_errors = 0
+        while time.time() < stop_at:
+            method, path, body = pick()
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers={'Content-Type': 'application/json'} if body else {})
+                response = conn.getresponse(); response.read()
+                if response.status >= 500: local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1; conn.close(); conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            local.append(time.perf_counter() - start)
+        with lock: latencies.extend(local); errors[0] += local_errors
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+    return {'requests': len(latencies), 'rps': len(latencies) / duration, 'p50': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99), 'errors': errors[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description='gunicorn 워커 수별 부하 테스트')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--skus', type=int, default=20000, help='합성 카탈로그 SKU 수')
+    parser.add_argument('--cache-ttl', type=int, default=0, help='CATALOG_CACHE_TTL (기본 0: DB 경로 측정)')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    pick = scenarios(*seed(args.skus))
+    env = {**os.environ, 'CATALOG_CACHE_TTL': str(args.cache_ttl), 'METRICS_ENABLED': os.environ.get('METRICS_ENABLED', '0')}
+    print(f"DB: {os.environ['DATABASE_URL']} / 스레드 {args.threads} / 동시 클라이언트 {args.concurrency} / {args.duration}s")
+    print(f"{'workers':>8} {'requests':>9} {'req/s':>8} {'p50(ms)':>8} {'p95(ms)':>8} {'p99(ms)':>8} {'errors':>7}")
+    for workers in args.workers:
+        process = start_server(workers, args.threads, args.port, env)
+        try: result = run_load(args.port, pick, args.concurrency, args.duration)
+        finally: process.terminate(); process.wait()
+        print(f"{workers:>8} {result['requests']:>9} {result['rps']:>8.1f} {result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f} {result['errors']:>7}")
+
+if __name__ == '__main__':
+    main()
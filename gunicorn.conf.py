@@ -0,0 +1,6 @@
+# gunicorn 설정 (Dockerfile CMD에서 사용). 워커/스레드 수는 명령줄 옵션(WEB_CONCURRENCY / GUNICORN_THREADS)으로 지정
+
+def post_worker_init(worker):
+    # 앱 로드 직후, 요청을 받기 전에 DB 커넥션 풀을 채움 (스케줄러는 첫 요청 때 지연 시작)
+    from app import warm_connection_pool
+    warm_connection_pool()